@@ -0,0 +1,187 @@
+# load test of the race server with simulated players, run from anywhere with
+#   python benchmarks/race_load.py [--clients 2000] [--players 2] [--think 0.2] [--connect host:port]
+# without --connect a server is started in a process of its own, so the players do not share its event loop
+import argparse
+import asyncio
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import numpy as np  # noqa: E402
+
+from scripts.race import CLEARED, DIFF, PLAYING, RESULT, START, WON, RaceClient  # noqa: E402
+from scripts.replay import Action  # noqa: E402
+
+
+class Load:  # what the simulated players measured
+    def __init__(self):
+        self.latency: dict[Action, list[float]] = {action: [] for action in Action}  # seconds from click to diff
+        self.games = 0
+        self.wins = 0
+        self.racing: dict[int, int] = {}  # race id -> players still in it
+        self.peak_races = 0
+        self.failed = 0  # players whose connection broke
+
+
+def choose(codes: np.ndarray, rng: np.random.Generator) -> tuple[Action, int]:  # a random but legal action
+    covered = np.flatnonzero(codes == 0)
+    numbers = np.flatnonzero(codes > CLEARED)
+    roll = rng.random()
+    if roll < 0.1:
+        flags = np.flatnonzero(codes == 2)
+        if len(flags) and rng.random() < 0.5:
+            return Action.flag, int(rng.choice(flags))
+        return Action.flag, int(rng.choice(covered))
+    if roll < 0.2 and len(numbers):
+        return Action.chord, int(rng.choice(numbers))
+    return Action.clear, int(rng.choice(covered))
+
+
+async def play(host: str, port: int, args: argparse.Namespace, load: Load, seed: int) -> None:
+    rng = np.random.default_rng(seed)
+    grid_size = tuple(args.size)
+    await asyncio.sleep(rng.uniform(0, args.ramp))  # players arrive over the ramp rather than all at once
+    try:
+        client = await RaceClient.connect(host, port)
+    except OSError:
+        load.failed += 1
+        return
+    try:
+        for _ in range(args.games):
+            client.join(grid_size, args.mines, args.players)
+            _, race_id, _, _, _, _, indices, start_codes = await client.expect(START)
+            load.racing[race_id] = load.racing.get(race_id, 0) + 1
+            load.peak_races = max(load.peak_races, len(load.racing))
+            codes = np.zeros(int(np.prod(grid_size)), np.uint8)
+            codes[indices] = start_codes
+            status = PLAYING
+            while status == PLAYING:
+                if args.think:
+                    await asyncio.sleep(rng.exponential(args.think))
+                action, index = choose(codes, rng)
+                sent = time.perf_counter()
+                seq = client.click(action, index)
+                while True:  # progress messages of the others may come first
+                    message = await client.expect(DIFF)
+                    if message[1] == seq:
+                        break
+                load.latency[action].append(time.perf_counter() - sent)
+                status = message[2]
+                codes[message[3]] = message[4]
+            await client.expect(RESULT)
+            load.games += 1
+            load.wins += status == WON
+            load.racing[race_id] -= 1
+            if not load.racing[race_id]:
+                del load.racing[race_id]
+    except (OSError, asyncio.IncompleteReadError):
+        load.failed += 1
+    finally:
+        client.writer.close()
+
+
+def server_rss(pid: int) -> int:  # resident bytes of a process, 0 where /proc is missing
+    try:
+        for line in Path(f'/proc/{pid}/status').read_text().splitlines():
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+async def run(args: argparse.Namespace, host: str, port: int, pid: int | None) -> dict:
+    load = Load()
+    base_rss = peak_rss = server_rss(pid) if pid else 0
+    start = time.perf_counter()
+    players = [asyncio.create_task(play(host, port, args, load, args.seed + i)) for i in range(args.clients)]
+    while not all(task.done() for task in players):
+        await asyncio.sleep(0.2)
+        if pid:
+            peak_rss = max(peak_rss, server_rss(pid))
+    seconds = time.perf_counter() - start
+    for task in players:
+        task.result()
+
+    latencies = np.concatenate([np.array(times) for times in load.latency.values()]) * 1000
+    report = {
+        'clients': args.clients,
+        'players_per_race': args.players,
+        'size': args.size,
+        'mines': args.mines,
+        'seconds': seconds,
+        'games': load.games,
+        'wins': load.wins,
+        'failed_clients': load.failed,
+        'peak_races': load.peak_races,
+        'actions': len(latencies),
+        'actions_per_second': len(latencies) / seconds,
+        'latency_ms': {},
+    }
+    for name, times in [('all', latencies)] + [(a.name, np.array(t) * 1000) for a, t in load.latency.items()]:
+        if len(times):
+            p50, p95, p99 = np.percentile(times, (50, 95, 99))
+            report['latency_ms'][name] = {'count': len(times), 'p50': p50, 'p95': p95, 'p99': p99,
+                                          'max': float(times.max())}
+    if pid:
+        report['server_rss_bytes'] = {'base': base_rss, 'peak': peak_rss,
+                                      'per_player': (peak_rss - base_rss) / args.clients}
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Load test the race server with simulated players.')
+    parser.add_argument('--connect', help='host:port of a running server, one is started if omitted')
+    parser.add_argument('--clients', type=int, default=1000, help='simulated players, all connected at once')
+    parser.add_argument('--players', type=int, default=2, help='players per race')
+    parser.add_argument('--games', type=int, default=3, help='races each player plays in a row')
+    parser.add_argument('--size', type=int, nargs='+', default=[16, 16])
+    parser.add_argument('--mines', type=int, default=40)
+    parser.add_argument('--think', type=float, default=0.2, help='mean seconds between two actions of a player')
+    parser.add_argument('--ramp', type=float, default=2.0, help='seconds over which the players connect')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help='print the report as json')
+    args = parser.parse_args()
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    server = None
+    if args.connect is None:
+        server = subprocess.Popen([sys.executable, 'race_server.py', '--port', '0'], cwd=ROOT,
+                                  stdout=subprocess.PIPE, text=True)
+        line = server.stdout.readline()  # race server listening on host:port
+        host, _, port = line.split()[-1].rpartition(':')
+    else:
+        host, _, port = args.connect.rpartition(':')
+    try:
+        report = asyncio.run(run(args, host, int(port), server.pid if server is not None else None))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    if args.json:
+        print(json.dumps(report))
+        return
+    print(f'{report["clients"]} players in races of {args.players} on {"x".join(map(str, args.size))} with '
+          f'{args.mines} mines, {args.think}s mean think time')
+    print(f'{report["games"]} games ({report["wins"]} won), at most {report["peak_races"]} races at once, '
+          f'{report["failed_clients"]} connections failed, {report["seconds"]:.2f}s')
+    print(f'{report["actions"]} actions, {report["actions_per_second"]:.0f}/s')
+    for name, stats in report['latency_ms'].items():
+        print(f'  {name:6} {stats["count"]:8} actions, latency ms p50 {stats["p50"]:.2f} p95 {stats["p95"]:.2f} '
+              f'p99 {stats["p99"]:.2f} max {stats["max"]:.2f}')
+    if 'server_rss_bytes' in report:
+        rss = report['server_rss_bytes']
+        print(f'server memory {rss["base"] / 2 ** 20:.1f}MiB at rest, {rss["peak"] / 2 ** 20:.1f}MiB at peak, '
+              f'{rss["per_player"] / 1024:.1f}KiB per player')
+
+
+if __name__ == '__main__':
+    main()
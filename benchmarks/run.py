@@ -0,0 +1,235 @@
+# benchmarks for board generation, reveals and frame rendering, run from anywhere with
+#   python benchmarks/run.py [--quick] [--output results.json] [--compare baseline.json]
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')  # render without a display
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import numpy as np  # noqa: E402
+
+from scripts.board import Board, TileState  # noqa: E402
+
+SIZES = ((8, 8), (30, 16), (100, 100), (500, 500), (2000, 2000))
+QUICK_SIZES = ((8, 8), (30, 16), (100, 100))
+DENSITIES = (0.1, 0.2, 0.3)
+STARTUP = 'import main; main.Game().frame(); print("first frame", flush=True)'
+
+
+def measure(run, setup=None, repeat: int = 5) -> dict:  # time run() after a fresh setup() each round
+    times = []
+    for _ in range(repeat):
+        state = setup() if setup is not None else None
+        gc.collect()
+        start = time.perf_counter()
+        run(state)
+        times.append(time.perf_counter() - start)
+    # tracing slows every allocation down, so the memory is measured in a round of its own
+    state = setup() if setup is not None else None
+    gc.collect()
+    tracemalloc.start()
+    run(state)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'median_s': statistics.median(times), 'min_s': min(times), 'peak_bytes': peak}
+
+
+def seeded_board(size: tuple[int, int], density: float, seed: int = 0) -> Board:
+    return Board(size, max(1, round(size[0] * size[1] * density)), seed)
+
+
+def first_tile(board: Board, number: int) -> tuple[int, ...]:  # position of the first tile with a number
+    return board.position(int(np.flatnonzero(board.cells == number)[0]))
+
+
+def board_benchmarks(size: tuple[int, int], density: float, repeat: int) -> dict:
+    name = f'{size[0]}x{size[1]}@{density:.0%}'
+    middle = (size[0] // 2, size[1] // 2)
+    results = {}
+
+    results[f'generate/{name}'] = measure(lambda board: board.generate(middle),
+                                          lambda: seeded_board(size, density), repeat)
+
+    def generated() -> Board:
+        board = seeded_board(size, density)
+        board.generate(middle)
+        return board
+
+    # the biggest zero region, so the flood fill does as much work as the board allows
+    def before_reveal() -> tuple[Board, tuple[int, ...]]:
+        board = generated()
+        sizes = np.diff(board.region_offsets)
+        if not len(sizes):
+            return board, middle
+        region = int(np.argmax(sizes)) + 1
+        return board, board.position(int(np.flatnonzero(board.region == region)[0]))
+
+    results[f'reveal/{name}'] = measure(lambda state: state[0].clear(state[1]), before_reveal, repeat)
+
+    # a number with its mines flagged, so the chord clears the rest of its neighbours
+    def before_chord() -> tuple[Board, tuple[int, ...]]:
+        board = generated()
+        pos = first_tile(board, 1) if np.any(board.cells == 1) else middle
+        index = board.index(pos)
+        board.states[index] = TileState.cleared
+        for neighbour in board.neighbours(index).tolist():
+            if board.cells[neighbour] == -1:
+                board.toggle_flag(board.position(neighbour))
+        return board, pos
+
+    results[f'chord/{name}'] = measure(lambda state: state[0].chord(state[1]), before_chord, repeat)
+
+    def played() -> Board:
+        board, pos = before_reveal()
+        board.clear(pos)
+        return board
+
+    results[f'restart/{name}'] = measure(lambda board: board.restart(), played, repeat)
+    return results
+
+
+def frame_benchmarks(sizes: tuple[tuple[int, int], ...], density: float, repeat: int) -> dict:
+    # a full MineTable2D.update() + MenuBar.update(), both steady and right after a reveal
+    os.chdir(ROOT)
+    import pygame
+    from main import Game
+    from scripts.mine_table import MineTable2D
+    game = Game()
+    results = {}
+    for size in sizes:
+        game.mine_table = MineTable2D(game, seeded_board(size, density))
+        table = game.mine_table
+        game.full_redraw = True
+
+        def frame(_=None) -> None:
+            if game.background.get_size() != game.screen.get_size():
+                game.build_background()
+            table.update()
+            game.menu_bar.update()
+            game.full_redraw = False
+            game.dirty_rects.clear()
+
+        def settle() -> None:  # let the solver's worker finish, so that it does not run during the next frame
+            deadline = time.perf_counter() + 10
+            while table.solver is not None:
+                table.solver.update()
+                if not table.solver.busy or time.perf_counter() > deadline:
+                    break
+                time.sleep(0.001)
+
+        frame()
+        frame()
+        name = f'{size[0]}x{size[1]}@{density:.0%}'
+        results[f'frame_idle/{name}'] = measure(frame, None, repeat * 4)
+
+        def after_reveal() -> None:  # the first click is drawn, the measured frame draws a second one
+            table.board.restart()
+            table.board.clear((size[0] // 2, size[1] // 2))
+            frame()
+            settle()
+            safe = np.flatnonzero((table.board.cells >= 0) & (table.board.states == TileState.none))
+            if len(safe):
+                table.board.clear(table.board.position(int(safe[0])))
+
+        results[f'frame_changed/{name}'] = measure(frame, after_reveal, repeat)
+
+        def resized() -> None:
+            settle()
+            game.full_redraw = True
+
+        results[f'frame_full/{name}'] = measure(frame, resized, repeat)
+    pygame.quit()
+    return results
+
+
+def startup_benchmarks(repeat: int) -> dict:
+    # time to the first frame in a fresh interpreter, imports and the asset cache included
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        child = subprocess.Popen([sys.executable, '-c', STARTUP], cwd=ROOT, stdout=subprocess.PIPE, text=True)
+        for line in child.stdout:  # printed right after the first frame, before the interpreter shuts down
+            if line.strip() == 'first frame':
+                break
+        times.append(time.perf_counter() - start)
+        child.wait()
+    # the memory of another process is not traced
+    return {'startup/first_frame': {'median_s': statistics.median(times), 'min_s': min(times), 'peak_bytes': 0}}
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> bool:  # prints a table, False on a regression
+    ok = True
+    print(f'{"benchmark":40} {"baseline":>12} {"now":>12} {"ratio":>7} {"memory":>7}')
+    for name, now in results['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            print(f'{name:40} {"-":>12} {now["min_s"] * 1000:10.3f}ms')
+            continue
+        # the fastest round is the least disturbed by the rest of the machine
+        ratio = now['min_s'] / max(before['min_s'], 1e-9)
+        memory = now['peak_bytes'] / max(before['peak_bytes'], 1)
+        slow = ratio > 1 + threshold and now['min_s'] - before['min_s'] > 1e-4  # ignore sub-0.1ms noise
+        heavy = memory > 1 + threshold and now['peak_bytes'] - before['peak_bytes'] > 64 * 1024
+        flag = ' REGRESSION' if slow or heavy else ''
+        ok = ok and not flag
+        print(f'{name:40} {before["min_s"] * 1000:10.3f}ms {now["min_s"] * 1000:10.3f}ms '
+              f'{ratio:7.2f} {memory:7.2f}{flag}')
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark board generation, reveals and rendering.')
+    parser.add_argument('--quick', action='store_true', help='only the boards up to 100x100')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', choices=('board', 'frame', 'startup'), help='run one group of benchmarks')
+    parser.add_argument('--output', type=Path, help='write the results as json')
+    parser.add_argument('--compare', type=Path, help='baseline json to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown or growth, 0.2 for 20%%')
+    args = parser.parse_args()
+
+    sizes = QUICK_SIZES if args.quick else SIZES
+    results = {}
+    if args.only in (None, 'board'):
+        for size in sizes:
+            for density in DENSITIES:
+                results.update(board_benchmarks(size, density, args.repeat))
+                print(f'boards {size[0]}x{size[1]} at {density:.0%} done', file=sys.stderr)
+    if args.only in (None, 'frame'):
+        results.update(frame_benchmarks(sizes, 0.2, args.repeat))
+    if args.only in (None, 'startup'):
+        results.update(startup_benchmarks(args.repeat))
+
+    import pygame
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pygame': pygame.version.ver,
+            'machine': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+    if args.output is not None:
+        args.output.write_text(json.dumps(report, indent=1), 'utf-8')
+    if args.compare is not None:
+        if not compare(report, json.loads(args.compare.read_text('utf-8')), args.threshold):
+            sys.exit(1)
+    elif args.output is None:
+        for name, result in results.items():
+            print(f'{name:40} {result["median_s"] * 1000:10.3f}ms {result["peak_bytes"] / 1024:10.1f}KiB')
+
+
+if __name__ == '__main__':
+    main()
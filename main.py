@@ -1,88 +1,273 @@
+import argparse
+import math
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
 import pygame
-import pygame_gui
 
+from scripts.assets import AssetCache, LazyAssets
+from scripts.board import Board
+from scripts.board_pool import BoardPool
+from scripts.chunked_board import ChunkedBoard
+from scripts.glyph_atlas import GlyphAtlas
 from scripts.menu_bar import MenuBar
-from scripts.mine_table import MineTable2D
-from scripts.utils import ConfigManager, load_images, load_sounds
+from scripts.mine_table import ChunkedMineTable, MineTable2D
+from scripts.profiler import FrameProfiler
+from scripts.race import START, RemoteBoard
+from scripts.savegame import Checkpointer
+from scripts.stats import StatsScreen, StatsStore
+from scripts.utils import ConfigManager, lazy_import, load_sounds
+
+pygame_gui = lazy_import('pygame_gui')  # slow to import, so it is only loaded once the window is up
 
 
 class Game:
-    def __init__(self):
+    def __init__(self, race_address: str | None = None, race_players: int = 2):
         self.config = ConfigManager('data/config.json')
         self.data = ConfigManager('./data/game.dat')
         pygame.init()
         pygame.mixer.init()
         pygame.font.init()
+        # the images are decoded once into a cache file, the window shows the background before anything else loads
+        self.images = AssetCache('./data/images', './data/assets.cache')
         pygame.display.set_caption(self.config['Graphics']['caption'])
-        pygame.display.set_icon(pygame.image.load('./data/images/' + self.config['Graphics']['icon']))
+        pygame.display.set_icon(self.images.surface(self.config['Graphics']['icon'].removesuffix('.png')))
         self.screen = pygame.display.set_mode(
             self.config['Graphics']['size'],
             pygame.DOUBLEBUF | pygame.RESIZABLE,
         )
+        self.assets = LazyAssets({
+            'background': lambda: self.images.surface('background').convert(),
+            'tile': lambda: self.images.surface('tile').convert_alpha(),
+            'flag': lambda: self.images.surface('flag').convert_alpha(),
+            'mine': lambda: self.images.surface('mine').convert_alpha(),
+            'explosion': lambda: self.images.frames('explosion'),
+        })
+        self.background = pygame.Surface((0, 0))  # background tiled over the whole screen
+        self.build_background()
+        self.screen.blit(self.background, (0, 0))
+        pygame.display.flip()
+
+        # sounds are only needed once a game is lost, so they load on a thread meanwhile
+        self.loader = ThreadPoolExecutor(1, 'assets')
+        self.sfx = LazyAssets({
+            'explode': self.loader.submit(load_sounds, 'explode', 0.75).result,
+        })
+        self.full_redraw = True  # redraw and flip the whole screen instead of only the dirty rects
+        self.redraw_requested = False  # set by events to force a full redraw next frame
+        self.dirty_rects: list[pygame.Rect] = []  # screen areas changed during the current frame
         self.clock = pygame.time.Clock()
         self.fps = self.config['Graphics']['fps']
+        # when idle, the loop sleeps until an event arrives or something on screen is due to change
+        self.idle = self.config['Graphics'].get('idle', False)
+        self.idle_tick = self.config['Graphics'].get('idle_tick', 0.1)  # seconds between redraws of a running clock
+        self.pending_events: list[pygame.event.Event] = []  # events taken off the queue while waiting
         self.ui_manager = pygame_gui.UIManager(self.config['Graphics']['size'])
-
-        self.assets = {
-            'background': pygame.image.load('./data/images/background.png').convert(),
-            'tile': pygame.image.load('./data/images/tile.png').convert_alpha(),
-            'flag': pygame.image.load('./data/images/flag.png').convert_alpha(),
-            'mine': pygame.image.load('./data/images/mine.png').convert_alpha(),
-            'explosion': load_images('explosion'),
-        }
-        self.sfx = {
-            'explode': load_sounds('explode', 0.75)
-        }
         self.font = pygame.font.Font('./data/Mojangles.ttf', 512)
+        self.glyphs = GlyphAtlas(self.font)
 
-        self.mine_table = MineTable2D(self, self.data['size'], self.data['mines'])
+        # finished games go to a local database, s shows their statistics
+        self.stats = StatsStore('./data/stats.db')
+        # the game in progress is saved in the background whenever it changes, and resumed on the next launch
+        self.checkpointer = Checkpointer('./data/save.dat')
+        # boards that never need a guess come from a pool filled by worker processes
+        self.board_pool = (BoardPool('./data/board_pool.dat')
+                           if self.data.get('no_guess', False) and race_address is None else None)
+        if len(self.data['size'] or (0, 0)) != self.data['dim']:
+            raise ValueError(f'board size {self.data["size"]} does not have {self.data["dim"]} dimensions')
+        # with an address, the board is mirrored from a race server and the others' progress shows in the caption
+        self.race: RemoteBoard | None = None
+        self.race_event = pygame.event.custom_type()  # posted by the network thread to wake the idle loop
+        if race_address is not None:
+            self.race = RemoteBoard(race_address, self.data['size'], self.data['mines'], race_players,
+                                    lambda: pygame.event.post(pygame.event.Event(self.race_event)))
+            self.mine_table = MineTable2D(self, self.race)
+            pygame.display.set_caption(f'{self.config["Graphics"]["caption"]} - {self.race.standing()}')
+        elif self.data.get('mode', 'classic') == 'chunked':  # 'size' may be null for an endless board
+            self.mine_table = ChunkedMineTable(self, ChunkedBoard(self.data['size'], self.data.get('density', 0.15)))
+        else:
+            saved = self.checkpointer.load()
+            if (saved is not None and saved[0].grid_size == tuple(self.data['size'])
+                    and saved[0].mine_total == self.data['mines']):
+                board = saved[0]
+            else:  # a save made with other settings is dropped at the next checkpoint
+                board, saved = Board(self.data['size'], self.data['mines']), None
+            if self.board_pool is not None:
+                board.mine_source = self.board_pool.take
+                self.board_pool.refill(board.grid_size, board.mine_total)
+            self.mine_table = MineTable2D(self, board)
+            if saved is not None:
+                self.mine_table.resume(saved[1] / 1000)
         self.menu_bar = MenuBar(self)
+        # f3 shows the frame timings, f4 writes them to a csv file, f5 profiles the next frames with cProfile
+        self.profiler = FrameProfiler(self)
+        self.stats_screen = StatsScreen(self, self.stats)
+
+    def build_background(self) -> None:  # tile the background image over the current screen size
+        self.background = pygame.Surface(self.screen.get_size())
+        self.background.fill('black')
+        for i in range(0, self.screen.get_size()[0], self.assets['background'].get_size()[0]):
+            for j in range(0, self.screen.get_size()[1], self.assets['background'].get_size()[1]):
+                self.background.blit(self.assets['background'], (i, j))
+
+    @property
+    def saved_board(self) -> Board | None:  # the board kept saved by the checkpointer, chunked boards and races are not
+        board = self.mine_table.board
+        return board if isinstance(board, Board) and self.race is None else None
+
+    def poll_race(self) -> None:  # apply what the race server sent since the last frame
+        was_over = self.race.over
+        kinds = self.race.poll()
+        if not kinds and self.race.connected:
+            return
+        if START in kinds:
+            self.mine_table.resume(0)  # the clock starts with the race, not when it was joined
+        if self.race.over and not was_over:
+            self.mine_table.finish()
+        pygame.display.set_caption(f'{self.config["Graphics"]["caption"]} - {self.race.standing()}')
 
-    def check_events(self) -> None:
-        for event in pygame.event.get():
+    def idle_timeout(self) -> float:  # seconds the loop may sleep before the next frame
+        if self.full_redraw or self.redraw_requested or self.pending_events or self.profiler.visible:
+            return 0
+        timeout = self.mine_table.idle_timeout(self.idle_tick)
+        if self.board_pool is not None and self.board_pool.busy:
+            timeout = min(timeout, 0.25)  # collect the boards of the workers
+        if self.saved_board is not None:
+            timeout = min(timeout, self.checkpointer.wait_time(self.saved_board))
+        return timeout
+
+    def wait(self) -> None:  # block until an event arrives or the idle timeout runs out
+        timeout = self.idle_timeout()
+        if timeout <= 0:
+            return
+        event = pygame.event.wait(-1 if timeout == math.inf else max(1, round(timeout * 1000)))
+        if event.type != pygame.NOEVENT:
+            self.pending_events.append(event)
+
+    def check_events(self) -> None:  # handle the input first thing in the frame, so that it is drawn right away
+        events = self.pending_events + pygame.event.get()
+        self.pending_events = []
+        now = pygame.time.get_ticks()  # pygame does not expose the event timestamps, the frame's is close enough
+        clicks: list[tuple[int, tuple[int, int], int]] = []  # board clicks, applied together once all are read
+        for event in events:
+            # events that move the view or replace the board apply the clicks before them first
+            if clicks and (event.type in (pygame.KEYDOWN, pygame.MOUSEWHEEL, pygame_gui.UI_BUTTON_PRESSED)
+                           or event.type == pygame.MOUSEMOTION and event.buttons[1]):
+                self.mine_table.clicked(clicks)
+                clicks = []
             if event.type == pygame.QUIT:
                 self.data.write()
+                if self.saved_board is not None:
+                    self.checkpointer.close(self.saved_board, self.mine_table.game_time)
+                self.stats.close()
+                if self.board_pool is not None:
+                    self.board_pool.write()
+                    self.board_pool.close()
                 pygame.mixer.quit()
                 pygame.font.quit()
                 pygame.quit()
                 sys.exit(0)
+            elif event.type in (pygame.VIDEORESIZE, pygame.WINDOWEXPOSED):
+                self.redraw_requested = True
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if event.button == 3:
-                    self.mine_table.right_clicked_on(event.pos)
+                    clicks.append((3, event.pos, now))
                 elif event.button == 2:
                     self.mine_table.wheel_clicked_on(event.pos)
+            elif event.type == pygame.MOUSEWHEEL:
+                self.mine_table.mouse_wheel(pygame.mouse.get_pos(), event.y)
+            elif event.type == pygame.MOUSEMOTION:
+                if event.buttons[1]:  # drag with the wheel held to pan
+                    self.mine_table.mouse_dragged(event.rel)
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_F3:
+                    self.profiler.toggle()
+                elif event.key == pygame.K_F4:
+                    self.profiler.dump()
+                elif event.key == pygame.K_F5:
+                    self.profiler.start_capture()
+                elif event.key == pygame.K_s:
+                    self.stats_screen.toggle()
+                else:
+                    self.mine_table.key_pressed(event.key)
             elif event.type == pygame.MOUSEBUTTONUP:
                 if event.button == 1:
-                    self.mine_table.left_clicked_on(event.pos)
+                    clicks.append((1, event.pos, now))
             elif event.type == pygame_gui.UI_BUTTON_PRESSED:
                 if event.ui_object_id == 'button_new':
                     self.mine_table.restart()
                 elif event.ui_object_id == 'button_again':
                     self.mine_table.restart(False)
             self.ui_manager.process_events(event)
+        if clicks:
+            self.mine_table.clicked(clicks)
 
     def run(self) -> None:
         # main loop
         while True:
-            time_delta = self.clock.tick(self.fps) / 1000
+            if self.idle:
+                self.wait()
+            self.frame()
+
+    def frame(self) -> None:
+        time_delta = self.clock.tick(self.fps) / 1000
+        self.profiler.begin()
 
-            # draw background
-            self.screen.fill('black')
-            for i in range(0, self.screen.get_size()[0], self.assets['background'].get_size()[0]):
-                for j in range(0, self.screen.get_size()[1], self.assets['background'].get_size()[1]):
-                    self.screen.blit(self.assets['background'], (i, j))
-            self.ui_manager.draw_ui(self.screen)
+        if self.board_pool is not None:
+            self.board_pool.update()
+        if self.race is not None:
+            self.poll_race()
+        self.check_events()
+        self.profiler.mark('events')
 
-            self.mine_table.update()
-            self.menu_bar.update()
-            self.ui_manager.update(time_delta)
+        # draw background, only behind the menu bar unless the whole screen needs a redraw
+        self.full_redraw = self.full_redraw or self.redraw_requested
+        self.redraw_requested = False
+        if self.background.get_size() != self.screen.get_size():
+            self.build_background()
+            self.full_redraw = True
+        if self.full_redraw:
+            self.screen.blit(self.background, (0, 0))
+        else:
+            menu_area = pygame.Rect(0, 0, self.screen.get_size()[0], self.mine_table.top_border)
+            self.screen.blit(self.background, menu_area, menu_area)
+            self.dirty_rects.append(menu_area)
+        self.profiler.mark('background')
+        self.ui_manager.draw_ui(self.screen)
+        self.profiler.mark('draw_ui')
 
-            self.check_events()
+        self.profiler.erase()
+        self.stats_screen.erase()
+        self.mine_table.update()
+        self.profiler.mark('mine_table')
+        self.menu_bar.update()
+        self.profiler.mark('menu_bar')
+        self.ui_manager.update(time_delta)
+        self.profiler.mark('ui_update')
 
+        for overlay in (self.stats_screen.draw(self.screen), self.profiler.draw(self.screen)):
+            if overlay is not None:
+                self.dirty_rects.append(overlay)
+        self.profiler.mark('overlays')
+
+        if self.full_redraw:
             pygame.display.flip()
+        else:
+            pygame.display.update(self.dirty_rects)
+        self.dirty_rects.clear()
+        self.full_redraw = False
+        self.profiler.mark('display')
+
+        if self.saved_board is not None:
+            self.checkpointer.update(self.saved_board, self.mine_table.game_time)
+        self.checkpointer.save_config(self.data)
+        self.profiler.mark('checkpoint')
+        self.profiler.end()
 
 
 if __name__ == '__main__':
-    Game().run()
+    parser = argparse.ArgumentParser(description='Minesweeper written in Python.')
+    parser.add_argument('--connect', metavar='HOST:PORT', help='race others on a server started with race_server.py')
+    parser.add_argument('--players', type=int, default=2, help='players per race, with --connect')
+    args = parser.parse_args()
+    Game(args.connect, args.players).run()
@@ -0,0 +1,39 @@
+import argparse
+import asyncio
+import resource
+
+from scripts.race import RaceServer
+
+
+async def serve(args: argparse.Namespace) -> None:
+    server = RaceServer(args.max_tiles, args.max_players)
+    listener = await server.serve(args.host, args.port)
+    host, port = listener.sockets[0].getsockname()[:2]
+    print(f'race server listening on {host}:{port}', flush=True)  # the load test reads the port from this line
+    async with listener:
+        while True:
+            await asyncio.sleep(args.report or 3600)
+            if args.report:
+                print(f'{server.connections} connected, {server.waiting()} waiting, {len(server.races)} races, '
+                      f'{server.actions} actions', flush=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Host minesweeper races, clients join with main.py --connect.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765, help='0 picks a free port')
+    parser.add_argument('--max-tiles', type=int, default=100_000, help='largest board a race may be played on')
+    parser.add_argument('--max-players', type=int, default=8)
+    parser.add_argument('--report', type=float, default=0, help='print the load every so many seconds')
+    args = parser.parse_args()
+    # every player is a socket, so allow as many as the system does
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
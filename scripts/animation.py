@@ -1,6 +1,28 @@
+from collections import OrderedDict
+
 import pygame
 
 
+class FrameCache:  # scaled frames shared by every animation, the least recently used ones are dropped first
+    def __init__(self, max_size: int = 256):
+        self.max_size = max_size
+        self.frames: OrderedDict[tuple[pygame.Surface, tuple[int, int]], pygame.Surface] = OrderedDict()
+
+    def get(self, frame: pygame.Surface, size: tuple[int, int]) -> pygame.Surface:
+        key = (frame, size)
+        if key in self.frames:
+            self.frames.move_to_end(key)
+            return self.frames[key]
+        scaled = pygame.transform.scale(frame, size)
+        self.frames[key] = scaled
+        while len(self.frames) > self.max_size:
+            self.frames.popitem(last=False)
+        return scaled
+
+
+frame_cache = FrameCache()
+
+
 class SimpleAnimation:
     def __init__(self, frames: list[pygame.Surface], img_dur: int, loop: bool = False):
         self.img_dur = img_dur
@@ -8,13 +30,13 @@ class SimpleAnimation:
         self.frames = frames
         self.loop = loop
         self.done = False
+        self.scale: float = 1.0
 
-    def scale_by(self, scale: float):
-        self.frames = [pygame.transform.scale_by(frame, scale) for frame in self.frames]
+    def scale_by(self, scale: float):  # applied when the frames are drawn with a relative size
+        self.scale *= scale
         return self
 
-    def update(self, screen: pygame.Surface, pos: tuple[int, int] | pygame.Rect,
-               size: tuple[int, int] | float = 1.0) -> None:
+    def advance(self) -> None:
         if self.loop:
             self.frame_count = (self.frame_count + 1) % (len(self.frames) * self.img_dur)
         else:
@@ -23,14 +45,21 @@ class SimpleAnimation:
                 if self.frame_count == len(self.frames) * self.img_dur - 1:
                     self.done = True
 
+    def frame(self, size: tuple[int, int] | float = 1.0) -> pygame.Surface:  # current frame at the given size
+        frame = self.frames[self.frame_count // self.img_dur]
+        if not isinstance(size, tuple):
+            size = (round(frame.get_size()[0] * size * self.scale), round(frame.get_size()[1] * size * self.scale))
+        if size == frame.get_size():
+            return frame
+        return frame_cache.get(frame, size)
+
+    def update(self, screen: pygame.Surface, pos: tuple[int, int] | pygame.Rect,
+               size: tuple[int, int] | float = 1.0) -> None:
+        self.advance()
+
 
 class Explosion(SimpleAnimation):
     def update(self, screen: pygame.Surface, pos: tuple[int, int] | pygame.Rect,
                size: tuple[int, int] | float = 1.0) -> None:
         super().update(screen, pos, size)
-        frame = self.frames[self.frame_count // self.img_dur]
-        if isinstance(size, tuple):
-            frame = pygame.transform.scale(frame, size)
-        elif (isinstance(size, float) or isinstance(size, int)) and size != 1:
-            frame = pygame.transform.scale_by(frame, size)
-        screen.blit(frame, pos)
+        screen.blit(self.frame(size), pos)
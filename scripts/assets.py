@@ -0,0 +1,80 @@
+import hashlib
+import json
+import struct
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import pygame
+
+from scripts.utils import atomic_write
+
+# a cache file is MAGIC, the index length as a little-endian u32, the json index, then the raw RGBA pixels
+MAGIC = b'MSAC'
+VERSION = 1
+
+
+class AssetCache:  # decoded pixels of every image under a folder, packed in one file rebuilt when they change
+    def __init__(self, folder: Path | str, path: Path | str):
+        self.folder = folder if isinstance(folder, Path) else Path(folder)
+        self.path = path if isinstance(path, Path) else Path(path)
+        self.index: dict[str, tuple[int, int, int]] = {}  # name -> (width, height, offset in the pixels)
+        self.pixels = memoryview(b'')
+        signature = self.signature()
+        if not self.load(signature):
+            self.build(signature)
+
+    def signature(self) -> str:  # changes whenever an image is added, removed or modified
+        digest = hashlib.sha1(str(VERSION).encode())
+        for file in sorted(self.folder.rglob('*.png')):
+            stat = file.stat()
+            digest.update(f'{file.relative_to(self.folder).as_posix()}:{stat.st_size}:{stat.st_mtime_ns};'.encode())
+        return digest.hexdigest()
+
+    def load(self, signature: str) -> bool:  # use the cache file if it matches the images, False otherwise
+        try:
+            data = self.path.read_bytes()
+            if data[:len(MAGIC)] != MAGIC:
+                return False
+            size, = struct.unpack_from('<I', data, len(MAGIC))
+            start = len(MAGIC) + 4
+            index = json.loads(data[start:start + size])
+        except (OSError, struct.error, ValueError):  # missing or cut short, rebuilt like a stale one
+            return False
+        if index.get('signature') != signature:
+            return False
+        self.index = {name: tuple(entry) for name, entry in index['images'].items()}
+        self.pixels = memoryview(data)[start + size:]
+        return True
+
+    def build(self, signature: str) -> None:  # decode every image once and write them out for the next start
+        pixels = bytearray()
+        for file in sorted(self.folder.rglob('*.png')):
+            image = pygame.image.load(file)
+            self.index[file.relative_to(self.folder).with_suffix('').as_posix()] = (*image.get_size(), len(pixels))
+            pixels += pygame.image.tobytes(image, 'RGBA')
+        self.pixels = memoryview(bytes(pixels))
+        index = json.dumps({'signature': signature, 'images': self.index}).encode()
+        atomic_write(self.path, MAGIC + struct.pack('<I', len(index)) + index + self.pixels)
+
+    def surface(self, name: str) -> pygame.Surface:  # an image by its path in the folder, without the extension
+        width, height, offset = self.index[name]
+        return pygame.image.frombuffer(self.pixels[offset:offset + width * height * 4], (width, height), 'RGBA')
+
+    def frames(self, name: str) -> list[pygame.Surface]:  # the numbered images of a folder, in order
+        count = sum(1 for key in self.index if key.startswith(name + '/'))
+        return [self.surface(f'{name}/{name}_{i}').convert_alpha() for i in range(count)]
+
+
+class LazyAssets:  # name -> asset, each loaded the first time it is asked for
+    def __init__(self, loaders: dict[str, Callable[[], Any]]):
+        self.loaders = loaders
+        self.loaded: dict[str, Any] = {}
+
+    def __getitem__(self, name: str) -> Any:
+        if name not in self.loaded:
+            self.loaded[name] = self.loaders[name]()
+        return self.loaded[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.loaders
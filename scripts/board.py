@@ -0,0 +1,285 @@
+import copy
+from enum import IntEnum, unique
+from itertools import product
+
+import numpy as np
+
+MINE = -1
+DIRECTIONS = ((-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1))
+
+
+@unique
+class TileState(IntEnum):
+    none = 0
+    cleared = 1
+    flagged = 2
+    mine_visible = 3
+
+
+class Board:  # game state of a minesweeper board with any number of dimensions, independent of pygame
+    def __init__(self, grid_size: tuple[int, ...], mine_total: int, seed: int | None = None):
+        self.grid_size = tuple(int(n) for n in grid_size)
+        self.dim = len(self.grid_size)
+        self.tile_total = int(np.prod(self.grid_size))
+        if not 1 <= self.dim <= 4 or min(self.grid_size) < 1:  # 3^5 - 1 neighbours would not fit in int8
+            raise ValueError(f'invalid board size {self.grid_size}')
+        if not 0 <= mine_total < self.tile_total:
+            raise ValueError(f'cannot place {mine_total} mines on a {"x".join(map(str, self.grid_size))} board')
+        self.mine_total = mine_total
+
+        # the tiles live in flat arrays; grid and grid_state are n-dimensional views of them
+        self.cells = np.zeros(self.tile_total, np.int8)  # -1 for mine; positive values for the number of nearby mines
+        self.states = np.zeros(self.tile_total, np.uint8)  # use enum TileState for values
+        self.grid = self.cells.reshape(self.grid_size)
+        self.grid_state = self.states.reshape(self.grid_size)
+        self.strides = np.array([int(np.prod(self.grid_size[axis + 1:])) for axis in range(self.dim)])
+
+        # the 3^d - 1 neighbour offsets, as coordinate deltas and as flat index deltas
+        self.offsets = np.array([delta for delta in product((-1, 0, 1), repeat=self.dim) if any(delta)])
+        self.flat_offsets = self.offsets @ self.strides
+        # slices pairing every tile with its neighbour along an offset, for the whole-board passes
+        self.neighbour_slices = [
+            (tuple(slice(max(0, -d), n - max(0, d)) for d, n in zip(delta, self.grid_size)),
+             tuple(slice(max(0, d), n + min(0, d)) for d, n in zip(delta, self.grid_size)))
+            for delta in self.offsets.tolist()
+        ]
+        # boundary masks: each tile gets a code for the edges it touches, and each code the offsets that stay inside
+        self.edge_code = np.zeros(self.grid_size, np.uint16)
+        for axis, n in enumerate(self.grid_size):
+            side = np.ones(n, np.uint16)  # 0 on the low edge, 2 on the high edge, 3 on both, 1 inside
+            side[0] = 0
+            side[-1] = 2
+            if n == 1:
+                side[0] = 3
+            shape = [1] * self.dim
+            shape[axis] = n
+            self.edge_code += side.reshape(shape) * np.uint16(4 ** axis)
+        self.edge_code = self.edge_code.reshape(-1)
+        self.code_offsets: dict[int, np.ndarray] = {}
+        for code in np.unique(self.edge_code).tolist():
+            valid = np.ones(len(self.offsets), bool)
+            for axis in range(self.dim):
+                side = code // 4 ** axis % 4
+                if side in (0, 3):
+                    valid &= self.offsets[:, axis] >= 0
+                if side in (2, 3):
+                    valid &= self.offsets[:, axis] <= 0
+            self.code_offsets[code] = self.flat_offsets[valid]
+
+        # connected regions of zeros, labelled once per generation so that a reveal clears a region at once
+        self.region = np.zeros(self.tile_total, np.int32)  # region id of each zero tile, 0 for other tiles
+        self.region_cells = np.zeros(0, np.int64)  # flat indices of every region and its border, grouped by id
+        self.region_offsets = np.zeros(1, np.int64)  # region i spans region_cells[offsets[i - 1]:offsets[i]]
+        self.tile_cleared = 0
+        self.tile_flagged = 0
+        self.generated = False
+        self.over = False
+        self.won = False
+        self.version = 0  # bumped whenever the tile states may have changed
+        self.generation = 0  # bumped whenever new mines are placed
+        self.seed = 0  # mines are generated from this seed, so a game can be replayed from it and the first click
+        self.rng = np.random.default_rng()
+        self.reseed(seed)
+        # optional callable (grid_size, mine_total, clicked_pos) -> mine mask, or None when not ready, e.g. a pool
+        self.mine_source = None
+
+    def reseed(self, seed: int | None = None) -> None:  # seed for the next generation, random if None
+        self.seed = int(np.random.SeedSequence().entropy) if seed is None else int(seed)
+        self.rng = np.random.default_rng(self.seed)
+
+    def index(self, pos: tuple[int, ...]) -> int:  # flat index of a coordinate
+        return sum(p * s for p, s in zip(pos, self.strides.tolist()))
+
+    def position(self, index: int) -> tuple[int, ...]:  # coordinate of a flat index
+        return tuple(int(p) for p in np.unravel_index(index, self.grid_size))
+
+    def neighbours(self, index: int) -> np.ndarray:  # flat indices of the tiles around a tile
+        return index + self.code_offsets[int(self.edge_code[index])]
+
+    def is_in_grid(self, pos: tuple[int, ...]) -> bool:  # decides if a coordinate is in the grid
+        return len(pos) == self.dim and all(0 <= p < n for p, n in zip(pos, self.grid_size))
+
+    def tile_state(self, pos: tuple[int, ...]) -> int:
+        return int(self.states[self.index(pos)])
+
+    def tile_number(self, pos: tuple[int, ...]) -> int:
+        return int(self.cells[self.index(pos)])
+
+    def generate(self, clicked_pos: tuple[int, ...]) -> None:  # generate the mines
+        if self.mine_source is not None:
+            mines = self.mine_source(self.grid_size, self.mine_total, tuple(clicked_pos))
+            if mines is not None:  # None while the source is still preparing them
+                self.set_mines(mines)
+            return
+        # sample distinct cells among all but the clicked one, then shift the indices past it
+        clicked = self.index(clicked_pos)
+        cells = self.rng.choice(self.tile_total - 1, self.mine_total, replace=False)
+        cells[cells >= clicked] += 1
+        mines = np.zeros(self.tile_total, bool)
+        mines[cells] = True
+        self.set_mines(mines)
+
+    def set_mines(self, mines: np.ndarray) -> None:  # fill the grid from a boolean mine mask
+        mines = mines.reshape(self.grid_size)
+        counts = np.zeros(self.grid_size, np.int8)
+        for tiles, neighbours in self.neighbour_slices:
+            counts[tiles] += mines[neighbours]
+        self.cells[:] = np.where(mines, np.int8(MINE), counts).reshape(-1)
+        self._label_regions()
+        self.generated = True
+        self.generation += 1
+
+    def twin(self) -> 'Board':  # a board on the same mines with tile states of its own, sharing everything else
+        # the shared arrays are only read while playing, so a race holds one copy of them for all its players;
+        # neither board may restart with new mines afterwards, since that refills them in place
+        board = copy.copy(self)
+        board.states = np.zeros_like(self.states)
+        board.grid_state = board.states.reshape(self.grid_size)
+        board.tile_cleared = 0
+        board.tile_flagged = 0
+        board.over = False
+        board.won = False
+        board.version = 0
+        return board
+
+    def _label_regions(self) -> None:
+        zero = self.grid == 0
+        total = self.tile_total
+        cell_index = np.arange(total).reshape(self.grid_size)
+        # union-find over the edges between neighbouring zeros: hook the larger root of each edge onto the smaller
+        # one and compress the paths, dropping the edges whose ends already share a root
+        u = [np.zeros(0, np.int64)]
+        v = [np.zeros(0, np.int64)]
+        for (tiles, neighbours), delta in zip(self.neighbour_slices, self.offsets.tolist()):
+            if next(d for d in delta if d) < 0:  # every edge once
+                continue
+            both = zero[tiles] & zero[neighbours]
+            u.append(cell_index[tiles][both])
+            v.append(cell_index[neighbours][both])
+        u = np.concatenate(u)
+        v = np.concatenate(v)
+        parent = np.arange(total)
+        while len(u):
+            root_u = parent[u]
+            root_v = parent[v]
+            apart = root_u != root_v
+            u, v, root_u, root_v = u[apart], v[apart], root_u[apart], root_v[apart]
+            np.minimum.at(parent, np.maximum(root_u, root_v), np.minimum(root_u, root_v))
+            while True:
+                grand = parent[parent]
+                if np.array_equal(grand, parent):
+                    break
+                parent = grand
+        flat_zero = zero.reshape(-1)
+        roots = np.flatnonzero(flat_zero & (parent == np.arange(total)))
+        region_of_root = np.zeros(total, np.int32)
+        region_of_root[roots] = np.arange(1, len(roots) + 1)
+        self.region = np.where(flat_zero, region_of_root[parent], 0).astype(np.int32)
+
+        # pair every region with its own tiles and with the numbered tiles around it
+        region = self.region.reshape(self.grid_size)
+        region_ids = [self.region[flat_zero]]
+        cells = [np.flatnonzero(flat_zero)]
+        numbered = self.grid > 0
+        for tiles, neighbours in self.neighbour_slices:
+            border = numbered[tiles] & (region[neighbours] > 0)
+            region_ids.append(region[neighbours][border])
+            cells.append(cell_index[tiles][border])
+        keys = np.sort(np.concatenate(region_ids).astype(np.int64) * total + np.concatenate(cells))
+        distinct = np.ones(len(keys), bool)
+        distinct[1:] = keys[1:] != keys[:-1]
+        keys = keys[distinct]
+        self.region_cells = keys % total
+        self.region_offsets = np.searchsorted(keys // total, np.arange(1, len(roots) + 2))
+
+    def restart(self, new: bool = True) -> None:
+        self.version += 1
+        self.tile_cleared = 0
+        self.tile_flagged = 0
+        if new:
+            self.reseed()
+            self.generated = False
+            self.cells.fill(0)
+            self.region.fill(0)
+            self.region_cells = np.zeros(0, np.int64)
+            self.region_offsets = np.zeros(1, np.int64)
+        self.states.fill(TileState.none)
+        self.over = False
+        self.won = False
+
+    def load_states(self, states: np.ndarray) -> None:  # jump to saved tile states of the current mines
+        self.version += 1
+        self.states[:] = states.reshape(-1)
+        self.tile_cleared = int(np.count_nonzero(self.states == TileState.cleared))
+        self.tile_flagged = int(np.count_nonzero(self.states == TileState.flagged))
+        self.won = self.generated and self.tile_cleared + self.mine_total == self.tile_total
+        self.over = self.won or bool(np.any(self.states == TileState.mine_visible))
+
+    def toggle_flag(self, pos: tuple[int, ...]) -> None:
+        if self.over or not self.is_in_grid(pos):
+            return
+        index = self.index(pos)
+        if self.states[index] == TileState.none:  # cleared tiles do not take flags, so they are no change
+            self.version += 1
+            self.states[index] = TileState.flagged
+            self.tile_flagged += 1
+        elif self.states[index] == TileState.flagged:
+            self.version += 1
+            self.states[index] = TileState.none
+            self.tile_flagged -= 1
+
+    def clear(self, pos: tuple[int, ...]) -> None:  # clear a single covered tile
+        if self.over or not self.is_in_grid(pos) or self.tile_state(pos) != TileState.none:
+            return
+        if not self.generated:
+            self.generate(pos)
+            if not self.generated:  # the mine source is not ready yet, the caller clears again later
+                return
+        self.version += 1
+        self._reveal(self.index(pos))
+        self._check_all_clear()
+
+    def chord(self, pos: tuple[int, ...]) -> None:  # clear the neighbours of a satisfied number
+        if self.over or not self.is_in_grid(pos) or self.tile_state(pos) != TileState.cleared:
+            return
+        index = self.index(pos)
+        neighbours = self.neighbours(index)
+        if np.count_nonzero(self.states[neighbours] == TileState.flagged) != self.cells[index]:
+            return
+        self.version += 1
+        for neighbour in neighbours.tolist():
+            if self.states[neighbour] == TileState.none:
+                self._reveal(neighbour)
+                if self.over:
+                    return
+        self._check_all_clear()
+
+    def _reveal(self, index: int) -> None:
+        if self.cells[index] == MINE:
+            self._lose()
+        elif self.cells[index] == 0:  # clear the whole region and its border
+            region = self.region[index]
+            cells = self.region_cells[self.region_offsets[region - 1]:self.region_offsets[region]]
+            covered = cells[self.states[cells] != TileState.cleared]
+            self.tile_flagged -= int(np.count_nonzero(self.states[covered] == TileState.flagged))
+            self.states[covered] = TileState.cleared
+            self.tile_cleared += len(covered)
+        else:
+            self.states[index] = TileState.cleared
+            self.tile_cleared += 1
+
+    def _lose(self) -> None:  # mine triggered, show every mine
+        self.over = True
+        self.states[self.cells == MINE] = TileState.mine_visible
+
+    def _check_all_clear(self) -> None:  # flag the remaining mines once every safe tile is cleared
+        if self.over or self.tile_cleared + self.mine_total != self.tile_total:
+            return
+        self.over = True
+        self.won = True
+        unflagged = (self.cells == MINE) & (self.states != TileState.flagged)
+        self.states[unflagged] = TileState.flagged
+        self.tile_flagged += int(np.count_nonzero(unflagged))
+
+    def mine_positions(self) -> list[tuple[int, ...]]:
+        return [tuple(int(p) for p in pos) for pos in np.argwhere(self.grid == MINE)]
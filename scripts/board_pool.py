@@ -0,0 +1,164 @@
+import base64
+import json
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import permutations, product
+from pathlib import Path
+
+import numpy as np
+
+from scripts.board import Board
+from scripts.solver import solvable
+from scripts.utils import atomic_write
+
+
+def generate_no_guess(grid_size: tuple[int, ...], mine_total: int, start: tuple[int, ...] | None = None,
+                      seed: int | None = None, attempts: int = 500) -> tuple[int, np.ndarray] | None:
+    # look for a board that logic alone clears from an opening at start (random if None), returns the start's
+    # flat index and the mine mask, or None if every attempt needed a guess
+    board = Board(grid_size, mine_total)
+    rng = np.random.default_rng(seed)
+    for _ in range(attempts):
+        first = rng.integers(board.tile_total) if start is None else board.index(start)
+        free = np.ones(board.tile_total, bool)  # keep the start and its neighbours clear so that it opens up
+        free[first] = False
+        free[board.neighbours(first)] = False
+        cells = np.flatnonzero(free)
+        if len(cells) < mine_total:
+            return None
+        mines = np.zeros(board.tile_total, bool)
+        mines[rng.choice(cells, mine_total, replace=False)] = True
+        board.set_mines(mines)
+        if solvable(board, board.position(first)):
+            return int(first), mines
+    return None
+
+
+class BoardPool:  # no-guess boards generated ahead in worker processes, kept per (size, mines) and on disk
+    def __init__(self, path: Path | str, size: int = 8, attempts: int = 500):
+        self.path = path if isinstance(path, Path) else Path(path)
+        self.size = size  # ready boards kept per configuration
+        self.attempts = attempts  # candidates tried by a worker before it gives up
+        self.boards: dict[str, list[tuple[int, np.ndarray]]] = {}  # key -> [(start index, flat mine mask)]
+        self.pending: dict[str, list[Future]] = {}
+        self.failures: dict[str, int] = {}  # jobs that found no board, refilling stops for too dense boards
+        self.executor: ProcessPoolExecutor | None = None  # started on the first refill
+        # a board generated around a click that no pooled board fitted: (size, mines, clicked position, job, tries),
+        # the job being None once every try failed
+        self.click_job: tuple[tuple[int, ...], int, tuple[int, ...], Future | None, int] | None = None
+        if self.path.exists():
+            for key, boards in json.loads(self.path.read_text('utf-8')).items():
+                self.boards[key] = [(start, np.unpackbits(np.frombuffer(base64.b64decode(mines), np.uint8),
+                                                          count=self.tile_total(key)).astype(bool))
+                                    for start, mines in boards]
+
+    @staticmethod
+    def key(grid_size: tuple[int, ...], mine_total: int) -> str:
+        return f'{"x".join(map(str, grid_size))}:{mine_total}'
+
+    @staticmethod
+    def tile_total(key: str) -> int:
+        return int(np.prod([int(n) for n in key.split(':')[0].split('x')]))
+
+    def refill(self, grid_size: tuple[int, ...], mine_total: int) -> None:  # queue jobs up to the pool size
+        key = self.key(grid_size, mine_total)
+        if self.failures.get(key, 0) >= 3:
+            return
+        pending = self.pending.setdefault(key, [])
+        for _ in range(self.size - len(self.boards.get(key, [])) - len(pending)):
+            pending.append(self.submit(grid_size, mine_total, None))
+
+    def submit(self, grid_size: tuple[int, ...], mine_total: int, start: tuple[int, ...] | None) -> Future:
+        if self.executor is None:
+            # spawned workers do not inherit the game's window and audio
+            self.executor = ProcessPoolExecutor(max(1, (os.cpu_count() or 2) - 1),
+                                                multiprocessing.get_context('spawn'))
+        seed = int(np.random.SeedSequence().entropy)
+        return self.executor.submit(generate_no_guess, tuple(grid_size), mine_total, start, seed, self.attempts)
+
+    def submit_click(self, grid_size: tuple[int, ...], mine_total: int, clicked_pos: tuple[int, ...],
+                     tries: int) -> None:
+        # the player waits for this board, so it goes ahead of the refill jobs that have not started yet
+        pending = self.pending.get(self.key(grid_size, mine_total), [])
+        pending[:] = [future for future in pending if not future.cancel()]
+        self.click_job = (grid_size, mine_total, clicked_pos, self.submit(grid_size, mine_total, clicked_pos), tries)
+        self.refill(grid_size, mine_total)
+
+    @property
+    def busy(self) -> bool:  # some boards are still being generated
+        return any(self.pending.values()) or self.click_job is not None and self.click_job[3] is not None
+
+    def update(self) -> None:  # collect finished jobs, cheap enough to call every frame
+        for key, pending in self.pending.items():
+            for future in [future for future in pending if future.done()]:
+                pending.remove(future)
+                result = None if future.cancelled() or future.exception() else future.result()
+                if result is None:
+                    self.failures[key] = self.failures.get(key, 0) + 1
+                else:
+                    self.boards.setdefault(key, []).append(result)
+        if self.click_job is not None and self.click_job[3] is not None and self.click_job[3].done():
+            grid_size, mine_total, clicked_pos, future, tries = self.click_job
+            key = self.key(grid_size, mine_total)
+            self.click_job = None
+            result = None if future.cancelled() or future.exception() else future.result()
+            if result is not None:  # joins the pool, where take() finds it fits the click
+                self.boards.setdefault(key, []).append(result)
+            elif tries < 3:
+                self.submit_click(grid_size, mine_total, clicked_pos, tries + 1)
+            else:  # given up, take() places the mines itself
+                self.failures[key] = self.failures.get(key, 0) + 1
+                self.click_job = (grid_size, mine_total, clicked_pos, None, tries)
+
+    def take(self, grid_size: tuple[int, ...], mine_total: int, clicked_pos: tuple[int, ...]) -> np.ndarray | None:
+        # mine mask of a no-guess board whose opening covers the clicked tile, mirrored or rotated to fit, or None
+        # while one is generated for the click on a worker; the click is then retried until it gets its board
+        self.update()
+        key = self.key(grid_size, mine_total)
+        request = (tuple(grid_size), mine_total, tuple(clicked_pos))
+        job = self.click_job
+        if job is not None and job[:3] == request and job[3] is not None:
+            return None  # still generating, update() above would have collected it otherwise
+        board = Board(grid_size, mine_total)
+        for i, (start, mines) in enumerate(self.boards.get(key, [])):
+            board.set_mines(mines)
+            opening = (board.region == board.region[start]).reshape(grid_size)
+            for transform in self.transforms(grid_size):
+                if transform(opening)[clicked_pos]:
+                    del self.boards[key][i]
+                    self.refill(grid_size, mine_total)
+                    return transform(mines.reshape(grid_size))
+
+        # nothing fits, so a worker generates one around this click, unless it already failed to find one
+        if job is None or job[:3] != request:
+            self.submit_click(*request, 1)
+            return None
+        self.refill(grid_size, mine_total)
+        self.click_job = None
+        print(f'no board without guesses found around {clicked_pos}, this one may need a guess')
+        mines = np.zeros(board.tile_total, bool)
+        cells = np.delete(np.arange(board.tile_total), board.index(clicked_pos))
+        mines[board.rng.choice(cells, mine_total, replace=False)] = True
+        return mines
+
+    @staticmethod
+    def transforms(grid_size: tuple[int, ...]) -> list:  # axis flips and swaps of equally long axes
+        dim = len(grid_size)
+        result = []
+        for order in permutations(range(dim)):
+            if any(grid_size[axis] != grid_size[i] for i, axis in enumerate(order)):
+                continue
+            for flips in product((False, True), repeat=dim):
+                axes = tuple(i for i, flip in enumerate(flips) if flip)
+                result.append(lambda grid, order=order, axes=axes: np.flip(np.transpose(grid, order), axes))
+        return result
+
+    def write(self) -> None:  # save the ready boards, replacing the file at once so it is never half written
+        data = {key: [(start, base64.b64encode(np.packbits(mines).tobytes()).decode('ascii'))
+                      for start, mines in boards] for key, boards in self.boards.items() if boards}
+        atomic_write(self.path, json.dumps(data).encode('utf-8'))
+
+    def close(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
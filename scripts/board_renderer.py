@@ -0,0 +1,121 @@
+import numpy as np
+import pygame
+
+from scripts.board import Board, TileState
+
+heat_buckets = 10  # mine probabilities are shown rounded to tenths
+no_heat = 255
+
+
+class BoardRenderer:  # keeps the board drawn on its own surface and redraws only the tiles whose state changed
+    def __init__(self, game):
+        self.game = game
+        self.tile_size: int = 0
+        self.pos: tuple[int, int] = (0, 0)
+        self.surface = pygame.Surface((0, 0))
+        self.sprites: dict[str, pygame.Surface] = {}
+        self.numbers: dict[int, pygame.Surface] = {}  # number glyphs fitted to the tile size
+        self.drawn_state: np.ndarray | None = None  # tile states as of the last redraw, None to redraw everything
+        self.drawn_version = -1
+        self.tints: dict[int, pygame.Surface] = {}  # translucent heatmap tiles, one per probability bucket
+        self.drawn_heat: np.ndarray | None = None  # heatmap buckets as of the last redraw
+        self.max_tile_rects = 64  # report the bounding box instead once more tiles than this change at once
+
+    @property
+    def rect(self) -> pygame.Rect:  # screen area covered by the board
+        return pygame.Rect(self.pos, self.surface.get_size())
+
+    def set_layout(self, tile_size: int, pos: tuple[int, int], grid_size: tuple[int, int]) -> bool:
+        pos = (int(pos[0]), int(pos[1]))
+        size = (grid_size[0] * tile_size, grid_size[1] * tile_size)
+        if tile_size == self.tile_size and pos == self.pos and size == self.surface.get_size():
+            return False
+        if tile_size != self.tile_size:  # rescale the sprites only when the tiles change size
+            self.game.glyphs.drop(self.tile_size)
+            self.tile_size = tile_size
+            for name in ('tile', 'flag', 'mine'):
+                self.sprites[name] = pygame.transform.scale(self.game.assets[name], (tile_size, tile_size))
+            self.numbers.clear()
+            self.tints.clear()
+        self.pos = pos
+        self.surface = pygame.Surface(size)
+        self.invalidate()
+        return True
+
+    def invalidate(self) -> None:  # redraw every tile next time
+        self.drawn_state = None
+
+    def number(self, number: int) -> pygame.Surface:
+        if number not in self.numbers:
+            colors = self.game.config['Color']
+            glyph = self.game.glyphs.glyph(str(number), colors[(number - 1) % len(colors)], self.tile_size)
+            if glyph.get_size()[0] > self.tile_size:  # numbers of 3d and 4d boards can have two digits
+                glyph = pygame.transform.scale_by(glyph, self.tile_size / glyph.get_size()[0])
+            self.numbers[number] = glyph
+        return self.numbers[number]
+
+    def tint(self, bucket: int) -> pygame.Surface:  # heatmap tile from green (safe) to red (mine)
+        if bucket not in self.tints:
+            self.tints[bucket] = pygame.Surface((self.tile_size, self.tile_size), pygame.SRCALPHA)
+            self.tints[bucket].fill(pygame.Color(0, 200, 0, 120).lerp((220, 0, 0, 120), bucket / heat_buckets))
+        return self.tints[bucket]
+
+    def redraw(self, board: Board, layer: list[int], heat: np.ndarray | None = None) -> list[pygame.Rect]:
+        # bring the cached surface up to date with the shown layer of the board, returns the changed screen rects;
+        # heat holds a probability bucket per tile (no_heat for none) to tint the covered tiles with
+        index = (slice(None), slice(None), *layer)
+        grid, grid_state = board.grid[index], board.grid_state[index]
+        layer_heat = None if heat is None else heat[index]
+        if self.drawn_state is None:
+            xs, ys = np.indices(grid.shape).reshape(2, -1)
+            self.surface.blit(self.game.background, (0, 0), self.rect)
+        elif board.version != self.drawn_version or heat is not self.drawn_heat:
+            changed = self.drawn_state != grid_state
+            if heat is not self.drawn_heat:
+                drawn_heat = no_heat if self.drawn_heat is None else self.drawn_heat[index]
+                changed |= (no_heat if heat is None else layer_heat) != drawn_heat
+            xs, ys = np.nonzero(changed)
+        else:
+            return []
+        self.drawn_state = grid_state.copy()
+        self.drawn_version = board.version
+        self.drawn_heat = heat
+        if not len(xs):
+            return []
+        full = len(xs) == grid.size
+
+        size = self.tile_size
+        tile, flag, mine = self.sprites['tile'], self.sprites['flag'], self.sprites['mine']
+        blits = []
+        buckets = [no_heat] * len(xs) if heat is None else layer_heat[xs, ys].tolist()
+        for x, y, number, state, bucket in zip(xs.tolist(), ys.tolist(), grid[xs, ys].tolist(),
+                                               grid_state[xs, ys].tolist(), buckets):
+            dest = (x * size, y * size)
+            if not full:
+                blits.append((self.game.background, dest,
+                              pygame.Rect(self.pos[0] + dest[0], self.pos[1] + dest[1], size, size)))
+            if state == TileState.cleared:
+                if number > 0:
+                    text = self.number(number)
+                    blits.append((text, (dest[0] + (size - text.get_size()[0]) // 2, dest[1])))
+            else:
+                blits.append((tile, dest))
+                if state == TileState.flagged:
+                    blits.append((flag, dest))
+                elif state == TileState.mine_visible:
+                    blits.append((mine, dest))
+                elif bucket != no_heat:
+                    blits.append((self.tint(bucket), dest))
+        self.surface.blits(blits, False)
+
+        if len(xs) > self.max_tile_rects:
+            return [pygame.Rect(self.pos[0] + int(xs.min()) * size, self.pos[1] + int(ys.min()) * size,
+                                (int(xs.max() - xs.min()) + 1) * size, (int(ys.max() - ys.min()) + 1) * size)]
+        return [pygame.Rect(self.pos[0] + x * size, self.pos[1] + y * size, size, size)
+                for x, y in zip(xs.tolist(), ys.tolist())]
+
+    def restore(self, screen: pygame.Surface, rect: pygame.Rect) -> None:  # repaint an area of the screen
+        screen.blit(self.game.background, rect, rect)
+        board_area = rect.clip(self.rect)
+        if board_area:
+            screen.blit(self.surface, board_area, board_area.move(-self.pos[0], -self.pos[1]))
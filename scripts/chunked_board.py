@@ -0,0 +1,203 @@
+from collections import deque
+
+import numpy as np
+
+from scripts.board import DIRECTIONS, MINE, TileState
+
+
+class ChunkedBoard:  # board split into chunks whose mines are generated from a seed the first time they are needed
+    min_endless_density = 0.12
+    dim = 2
+
+    def __init__(self, grid_size: tuple[int, int] | None, density: float, seed: int | None = None,
+                 chunk_size: int = 16):
+        self.grid_size = None if grid_size is None else (int(grid_size[0]), int(grid_size[1]))  # None for endless
+        if not 0 < density < 1:
+            raise ValueError(f'mine density must be between 0 and 1, got {density}')
+        if self.grid_size is None and density < self.min_endless_density:
+            # sparser fields have unbounded zero regions, so a single click could never finish clearing
+            raise ValueError(f'an endless board needs a mine density of at least {self.min_endless_density}')
+        self.density = density
+        self.chunk_size = chunk_size
+        self.seed = int(np.random.SeedSequence().entropy) if seed is None else seed
+        self.mine_total = None  # only known once every chunk exists
+        self.mines: dict[tuple[int, int], np.ndarray] = {}  # bool mine masks of the generated chunks
+        self.numbers: dict[tuple[int, int], np.ndarray] = {}  # grids in the same format as Board.grid
+        self.states: dict[tuple[int, int], np.ndarray] = {}  # TileState values of the chunks touched so far
+        self.chunk_versions: dict[tuple[int, int], int] = {}  # bumped whenever a chunk's states change
+        self.safe_pos: tuple[int, int] | None = None  # first click, kept free of mines with its neighbours
+        self.mine_count = 0  # mines in the generated chunks
+        self.chunks_generated = 0  # generated chunks that overlap a bounded board
+        self.tile_cleared = 0
+        self.tile_flagged = 0
+        self.generated = False
+        self.over = False
+        self.won = False
+        self.version = 0
+
+    @property
+    def chunk_total(self) -> int | None:
+        if self.grid_size is None:
+            return None
+        return -(-self.grid_size[0] // self.chunk_size) * -(-self.grid_size[1] // self.chunk_size)
+
+    def is_in_grid(self, pos: tuple[int, int]) -> bool:
+        return len(pos) == 2 and (self.grid_size is None or
+                                  (0 <= pos[0] < self.grid_size[0] and 0 <= pos[1] < self.grid_size[1]))
+
+    def split(self, x: int, y: int) -> tuple[tuple[int, int], tuple[int, int]]:  # chunk and position inside it
+        cx, lx = divmod(x, self.chunk_size)
+        cy, ly = divmod(y, self.chunk_size)
+        return (cx, cy), (lx, ly)
+
+    def chunk_mines(self, chunk: tuple[int, int]) -> np.ndarray:
+        if chunk not in self.mines:
+            # every chunk gets its own random stream derived from the seed, so the order of generation is irrelevant
+            zigzag = [c * 2 if c >= 0 else -c * 2 - 1 for c in chunk]
+            rng = np.random.default_rng([self.seed, *zigzag])
+            mines = rng.random((self.chunk_size, self.chunk_size)) < self.density
+            xs = np.arange(self.chunk_size)[:, None] + chunk[0] * self.chunk_size
+            ys = np.arange(self.chunk_size)[None, :] + chunk[1] * self.chunk_size
+            if self.grid_size is not None:
+                inside = (xs >= 0) & (ys >= 0) & (xs < self.grid_size[0]) & (ys < self.grid_size[1])
+                mines &= inside
+                self.chunks_generated += bool(inside.any())
+            if self.safe_pos is not None:
+                mines &= (abs(xs - self.safe_pos[0]) > 1) | (abs(ys - self.safe_pos[1]) > 1)
+            self.mines[chunk] = mines
+            self.mine_count += int(np.count_nonzero(mines))
+        return self.mines[chunk]
+
+    def chunk_numbers(self, chunk: tuple[int, int]) -> np.ndarray:
+        if chunk not in self.numbers:
+            cx, cy = chunk
+            around = np.block([[self.chunk_mines((cx + dx, cy + dy)) for dy in (-1, 0, 1)] for dx in (-1, 0, 1)])
+            size = self.chunk_size
+            counts = np.zeros((size, size), np.int8)
+            for dx, dy in DIRECTIONS:
+                counts += around[size + dx:size * 2 + dx, size + dy:size * 2 + dy]
+            self.numbers[chunk] = np.where(self.chunk_mines(chunk), np.int8(MINE), counts)
+        return self.numbers[chunk]
+
+    def chunk_states(self, chunk: tuple[int, int]) -> np.ndarray:
+        if chunk not in self.states:
+            self.states[chunk] = np.zeros((self.chunk_size, self.chunk_size), np.uint8)
+        return self.states[chunk]
+
+    def tile_state(self, pos: tuple[int, int]) -> int:
+        chunk, (lx, ly) = self.split(*pos)
+        return int(self.states[chunk][lx, ly]) if chunk in self.states else TileState.none
+
+    def tile_number(self, pos: tuple[int, int]) -> int:
+        chunk, (lx, ly) = self.split(*pos)
+        return int(self.chunk_numbers(chunk)[lx, ly])
+
+    def _set_state(self, pos: tuple[int, int], state: TileState) -> None:
+        chunk, (lx, ly) = self.split(*pos)
+        self.chunk_states(chunk)[lx, ly] = state
+        self.chunk_versions[chunk] = self.chunk_versions.get(chunk, 0) + 1
+
+    def restart(self, new: bool = True) -> None:
+        self.version += 1
+        self.tile_cleared = 0
+        self.tile_flagged = 0
+        if new:
+            self.seed = int(np.random.SeedSequence().entropy)
+            self.safe_pos = None
+            self.mines.clear()
+            self.numbers.clear()
+            self.mine_count = 0
+            self.mine_total = None  # unknown again until every chunk of the new board exists
+            self.chunks_generated = 0
+            self.generated = False
+        for chunk in self.states:
+            self.chunk_versions[chunk] = self.chunk_versions.get(chunk, 0) + 1
+        self.states.clear()
+        self.over = False
+        self.won = False
+
+    def toggle_flag(self, pos: tuple[int, int]) -> None:
+        if self.over or not self.is_in_grid(pos):
+            return
+        if self.tile_state(pos) == TileState.none:  # cleared tiles do not take flags, so they are no change
+            self.version += 1
+            self._set_state(pos, TileState.flagged)
+            self.tile_flagged += 1
+        elif self.tile_state(pos) == TileState.flagged:
+            self.version += 1
+            self._set_state(pos, TileState.none)
+            self.tile_flagged -= 1
+
+    def clear(self, pos: tuple[int, int]) -> None:
+        if self.over or not self.is_in_grid(pos) or self.tile_state(pos) != TileState.none:
+            return
+        if not self.generated:
+            self.safe_pos = tuple(pos)
+            self.generated = True
+        self.version += 1
+        self._reveal(pos)
+        self._check_all_clear()
+
+    def chord(self, pos: tuple[int, int]) -> None:
+        if self.over or not self.is_in_grid(pos) or self.tile_state(pos) != TileState.cleared:
+            return
+        neighbours = [(pos[0] + dx, pos[1] + dy) for dx, dy in DIRECTIONS]
+        neighbours = [neighbour for neighbour in neighbours if self.is_in_grid(neighbour)]
+        flagged = sum(self.tile_state(neighbour) == TileState.flagged for neighbour in neighbours)
+        if flagged != self.tile_number(pos):
+            return
+        self.version += 1
+        for neighbour in neighbours:
+            if self.tile_state(neighbour) == TileState.none:
+                self._reveal(neighbour)
+                if self.over:
+                    return
+        self._check_all_clear()
+
+    def _reveal(self, pos: tuple[int, int]) -> None:  # bfs, as regions cannot be labelled ahead on a lazy board
+        if self.tile_number(pos) == MINE:
+            self._lose()
+            return
+        queue = deque([pos])
+        visited = {pos}
+        while queue:
+            tile = queue.popleft()
+            state = self.tile_state(tile)
+            if state != TileState.cleared:
+                if state == TileState.flagged:
+                    self.tile_flagged -= 1
+                self._set_state(tile, TileState.cleared)
+                self.tile_cleared += 1
+            if self.tile_number(tile) > 0:
+                continue
+            for dx, dy in DIRECTIONS:
+                neighbour = (tile[0] + dx, tile[1] + dy)
+                if neighbour not in visited and self.is_in_grid(neighbour) and self.tile_number(neighbour) >= 0:
+                    queue.append(neighbour)
+                    visited.add(neighbour)
+
+    def _lose(self) -> None:  # mine triggered, show every generated mine
+        self.over = True
+        for chunk, mines in self.mines.items():
+            if mines.any():
+                self.chunk_states(chunk)[mines] = TileState.mine_visible
+                self.chunk_versions[chunk] = self.chunk_versions.get(chunk, 0) + 1
+
+    def _check_all_clear(self) -> None:  # only a bounded board can be cleared, once all of its chunks exist
+        if self.over or self.grid_size is None or self.chunks_generated < self.chunk_total:
+            return
+        if self.tile_cleared + self.mine_count != self.grid_size[0] * self.grid_size[1]:
+            return
+        self.over = True
+        self.won = True
+        self.mine_total = self.mine_count
+        for chunk, mines in self.mines.items():
+            states = self.chunk_states(chunk)
+            unflagged = mines & (states != TileState.flagged)
+            states[unflagged] = TileState.flagged
+            self.tile_flagged += int(np.count_nonzero(unflagged))
+            self.chunk_versions[chunk] = self.chunk_versions.get(chunk, 0) + 1
+
+    def mine_positions(self) -> list[tuple[int, int]]:
+        return [(cx * self.chunk_size + int(x), cy * self.chunk_size + int(y))
+                for (cx, cy), mines in self.mines.items() for x, y in np.argwhere(mines)]
@@ -0,0 +1,38 @@
+from collections.abc import Iterable, Sequence
+
+import pygame
+
+
+class GlyphAtlas:  # text pieces rendered once with the big font and kept scaled to the heights in use
+    def __init__(self, font: pygame.font.Font):
+        self.font = font
+        self.pages: dict[int, dict[tuple[str, str], pygame.Surface]] = {}  # height -> (text, color) -> glyph
+
+    def glyph(self, text: str, color: str, height: int) -> pygame.Surface:
+        page = self.pages.setdefault(height, {})
+        key = (text, color)
+        if key not in page:
+            rendered = self.font.render(text, True, pygame.Color(color))
+            page[key] = pygame.transform.scale_by(rendered, height / rendered.get_size()[1])
+        return page[key]
+
+    def preload(self, texts: Iterable[str], color: str, height: int) -> None:
+        for text in texts:
+            self.glyph(text, color, height)
+
+    def drop(self, height: int) -> None:  # forget the glyphs of a height that is no longer used
+        self.pages.pop(height, None)
+
+    def width(self, pieces: Sequence[str], color: str, height: int) -> int:
+        return sum(self.glyph(piece, color, height).get_size()[0] for piece in pieces)
+
+    def draw(self, surface: pygame.Surface, pos: tuple[float, float], pieces: Sequence[str], color: str,
+             height: int) -> pygame.Rect:  # blit the pieces side by side, returns the covered area
+        x, y = round(pos[0]), round(pos[1])
+        blits = []
+        for piece in pieces:
+            glyph = self.glyph(piece, color, height)
+            blits.append((glyph, (x, y)))
+            x += glyph.get_size()[0]
+        surface.blits(blits, False)
+        return pygame.Rect(round(pos[0]), y, x - round(pos[0]), height)
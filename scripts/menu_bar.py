@@ -1,5 +1,8 @@
 import pygame
-import pygame_gui
+
+from scripts.utils import lazy_import
+
+pygame_gui = lazy_import('pygame_gui')
 
 
 class MenuBar:
@@ -9,37 +12,51 @@ class MenuBar:
         self.default_height = 70
         self.height: int = 0
         self.border: int = 10
+        self.screen_size: tuple[int, int] = (0, 0)
+        self.layout: tuple = ()  # what the buttons were last laid out for
 
         self.button_new = pygame_gui.elements.UIButton(pygame.Rect(0, 0, 0, 0), 'New Game',
                                                        self.game.ui_manager, object_id='button_new')
         self.button_again = pygame_gui.elements.UIButton(pygame.Rect(0, 0, 0, 0), 'Play Again',
                                                          self.game.ui_manager, object_id='button_again')
 
+    @property
+    def text_height(self) -> int:
+        return max(1, round(self.height / 2))
+
     def update(self) -> None:
         screen_size: tuple[int, int] = self.game.screen.get_size()
-        self.height = round(self.default_height * screen_size[1] / self.game.config['Graphics']['size'][1])
+        if screen_size != self.screen_size:  # rebuild the glyphs for the new height
+            self.screen_size = screen_size
+            self.game.glyphs.drop(self.text_height)
+            self.height = round(self.default_height * screen_size[1] / self.game.config['Graphics']['size'][1])
+            self.game.glyphs.preload(('Time: ', 'Mines Left: ', 'Flags: ', *'0123456789.-/s'), 'white',
+                                     self.text_height)
 
         # draw texts
-        text_time: pygame.Surface = self.game.font.render(f'Time: {self.game.mine_table.game_time / 60:.3f}s',
-                                                              True, 'white')
-        text_time = pygame.transform.scale_by(text_time, self.height / 2 / text_time.get_size()[1])
-        self.game.screen.blit(text_time, (
-            (screen_size[0] - text_time.get_size()[0]) / 2, self.border
-        ))
-        text_mine: pygame.Surface = self.game.font.render(
-            f'Mines Left: {self.game.mine_table.mine_total - self.game.mine_table.tile_flagged}'
-            f'/{self.game.mine_table.mine_total}',
-            True,
-            'white',
-        )
-        text_mine = pygame.transform.scale_by(text_mine, self.height / 2 / text_mine.get_size()[1])
-        self.game.screen.blit(text_mine, (
-            (screen_size[0] - text_mine.get_size()[0]) / 2, self.border + self.height / 2
-        ))
+        glyphs = self.game.glyphs
+        mine_table = self.game.mine_table
+        time_pieces = ['Time: ', *f'{mine_table.game_time:.3f}', 's']
+        if mine_table.mine_total is None:  # chunked boards do not know their mine count in advance
+            mine_pieces = ['Flags: ', *str(mine_table.tile_flagged)]
+        else:
+            mine_pieces = ['Mines Left: ', *str(mine_table.mine_total - mine_table.tile_flagged),
+                           '/', *str(mine_table.mine_total)]
+        if mine_table.layer:  # position of the shown layer on boards with more than two dimensions
+            mine_pieces += ['  Layer: ', *','.join(str(i + 1) for i in mine_table.layer)]
+        time_width = glyphs.width(time_pieces, 'white', self.text_height)
+        mine_width = glyphs.width(mine_pieces, 'white', self.text_height)
+        glyphs.draw(self.game.screen, ((screen_size[0] - time_width) / 2, self.border),
+                    time_pieces, 'white', self.text_height)
+        glyphs.draw(self.game.screen, ((screen_size[0] - mine_width) / 2, self.border + self.height / 2),
+                    mine_pieces, 'white', self.text_height)
 
         # change the size and pos of buttons
-        button_space = (screen_size[0] - max(text_time.get_size()[0], text_mine.get_size()[0])) / 2 - self.border
-        self.button_new.set_dimensions((button_space * 2 / 7, self.height * 2 / 3))
-        self.button_new.set_position((button_space * 4 / 35, self.border + self.height / 6))
-        self.button_again.set_dimensions((button_space * 2 / 7, self.height * 2 / 3))
-        self.button_again.set_position((button_space * 2 / 5 + self.border * 2, self.border + self.height / 6))
+        layout = (screen_size, max(time_width, mine_width))
+        if layout != self.layout:
+            self.layout = layout
+            button_space = (screen_size[0] - layout[1]) / 2 - self.border
+            self.button_new.set_dimensions((button_space * 2 / 7, self.height * 2 / 3))
+            self.button_new.set_position((button_space * 4 / 35, self.border + self.height / 6))
+            self.button_again.set_dimensions((button_space * 2 / 7, self.height * 2 / 3))
+            self.button_again.set_position((button_space * 2 / 5 + self.border * 2, self.border + self.height / 6))
@@ -1,48 +1,82 @@
 import math
-from enum import Enum, unique
-from random import choice, randint, random, uniform
+import time
+from random import choice, random
 
+import numpy as np
 import pygame
 
 from scripts.animation import SimpleAnimation, Explosion
-
-
-@unique
-class TileState(Enum):
-    none = 0
-    cleared = 1
-    flagged = 2
-    mine_visible = 3
+from scripts.board import Board, TileState
+from scripts.board_renderer import BoardRenderer, heat_buckets, no_heat
+from scripts.chunked_board import ChunkedBoard
+from scripts.race import RemoteBoard
+from scripts.replay import Action, ReplayRecorder
+from scripts.solver import Solver
 
 
 class MineTable2D:
-    def __init__(self, game, grid_size: tuple[int, int], mine_total: int):
+    def __init__(self, game, board: Board):
         self.game = game
-        self.grid_size = grid_size
-        self.mine_total = mine_total
-        self.game_time: int = 0  # measured in frames
-        self.grid = []  # -1 for mine; positive values for the number of nearby mines
-        self.grid_state = []  # use enum TileState for values
-        self.tile_cleared = 0
-        self.tile_flagged = 0
-        for i in range(self.grid_size[0]):
-            self.grid.append([0] * self.grid_size[1])
-            self.grid_state.append([TileState.none] * self.grid_size[1])
+        self.board = board
+        self.start_time = time.monotonic()  # when the game started, the clock stops at end_time once it is over
+        self.end_time: float | None = None
         self.pos: list[int] = [0, 0]
         self.tile_size: int = 0
-        self.over = False
 
         self.border: int = 10
         self.default_top_border = 80
         self.top_border = self.default_top_border
-        self.default_numbers = [self.game.font.render(str(i), True, pygame.Color(c))
-                                for i, c in enumerate(self.game.config['Color'], 1)]
+        self.table_area = pygame.Rect(0, 0, 0, 0)  # screen area below the menu bar
         self.anim_dict: dict[tuple[int, int], tuple[SimpleAnimation, tuple[float, float]]] = {}
+        self.renderer = BoardRenderer(self.game)
+        self.overlay_rects: list[pygame.Rect] = []  # hover box and animations drawn over the board last frame
+
+        # a second click on the same cleared tile within double_click_ms chords it
+        self.last_click: tuple[tuple[int, ...], int] | None = None  # cell and time in ms of the last such click
+        self.double_click_ms = 500
+        # the first clear waits here while a no-guess board is generated around it, and is applied once it arrives
+        self.pending_clear: tuple[int, ...] | None = None
+
+        # boards with more than two dimensions are shown one 2d layer at a time
+        self.layer: list[int] = [0] * (self.board.dim - 2)  # coordinates of the shown layer on the extra axes
+        self.layer_axis = 0  # extra axis moved along with page up/down
+
+        # the solver follows the board on a worker thread from the first time h asks it for a hint or p toggles the
+        # probability heatmap; races are played without hints or replays, the remote board only knows what the
+        # server sent
+        self.local = isinstance(self.board, Board) and not isinstance(self.board, RemoteBoard)
+        self.solver: Solver | None = None
+        self.hint_cell: int | None = None  # flat index of the hinted tile
+        self.hint_wanted = False  # h was pressed, the hint is shown once the solver caught up with the board
+        self.show_heatmap = False
+        self.heat: np.ndarray | None = None  # probability buckets of the tiles, rebuilt when the solver moves on
+        self.heat_version = -1
+
+        # every action is recorded, and finished games are appended to the replay file if enabled in game.dat
+        self.recorder = ReplayRecorder(self.board) if self.local else None
+        self.resumed = False  # a resumed game is not saved as a replay, since the recorder missed its start
+        if self.recorder is not None:
+            self.recorder.start()
+
+    @property
+    def game_time(self) -> float:  # seconds since the game started
+        return (self.end_time or time.monotonic()) - self.start_time
 
-        self.generated = False
+    @property
+    def grid_size(self) -> tuple[int, int]:
+        return self.board.grid_size
 
-        self.double_click_dict: dict[tuple[int, int], int] = {}
-        self.double_click_time = 30  # 0.5s under 60fps
+    @property
+    def mine_total(self) -> int | None:  # None when unknown in advance
+        return self.board.mine_total
+
+    @property
+    def tile_flagged(self) -> int:
+        return self.board.tile_flagged
+
+    @property
+    def over(self) -> bool:
+        return self.board.over
 
     def pixel_to_grid(self, x: int, y: int) -> tuple[int, int]:  # convert a pixel coordinate to a grid one
         return math.floor((x - self.pos[0]) / self.tile_size), math.floor((y - self.pos[1]) / self.tile_size)
@@ -50,219 +84,384 @@ class MineTable2D:
     def grid_to_pixel(self, x: int, y: int) -> tuple[int, int]:  # convert a grid coordinate to a pixel one
         return self.pos[0] + self.tile_size * x, self.pos[1] + self.tile_size * y
 
+    def cell(self, x: int, y: int) -> tuple[int, ...]:  # board coordinate of a tile in the shown layer
+        return (x, y, *self.layer)
+
     def is_in_grid(self, x: int, y: int) -> bool:  # decides if a coordinate is in the grid
-        return 0 <= x < self.grid_size[0] and 0 <= y < self.grid_size[1]
-
-    def generate(self, clicked_pos: tuple[int, int]) -> None:  # generate the mines
-        for _ in range(self.mine_total):
-            x = randint(0, self.grid_size[0] - 1)
-            y = randint(0, self.grid_size[1] - 1)
-            while self.grid[x][y] == -1 or (x, y) == clicked_pos:
-                x = randint(0, self.grid_size[0] - 1)
-                y = randint(0, self.grid_size[1] - 1)
-            self.grid[x][y] = -1
-        directions = ((-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1))
-        for i in range(self.grid_size[0]):
-            for j in range(self.grid_size[1]):
-                if self.grid[i][j] != -1:
-                    for dx, dy in directions:
-                        if 0 <= i + dx < self.grid_size[0] and 0 <= j + dy < self.grid_size[1] \
-                                and self.grid[i + dx][j + dy] == -1:
-                            self.grid[i][j] += 1
+        return self.board.is_in_grid(self.cell(x, y))
 
     def restart(self, new: bool = True):
-        self.game_time: int = 0
-        self.tile_cleared = 0
-        self.tile_flagged = 0
-        if new:
-            self.generated = False
-        for i in range(self.grid_size[0]):
-            for j in range(self.grid_size[1]):
-                self.grid_state[i][j] = TileState.none
-                if new:
-                    self.grid[i][j] = 0
-        self.over = False
+        self.start_time = time.monotonic()
+        self.end_time = None
+        self.resumed = False
+        self.board.restart(new)
+        if self.recorder is not None:
+            self.recorder.start()
         self.anim_dict.clear()
-        self.double_click_dict.clear()
+        self.hint_cell = None
+        self.hint_wanted = False
+        self.last_click = None
+        self.pending_clear = None
 
-    def right_clicked_on(self, pos: tuple[int, int]) -> None:  # right click to flag
+    def resume(self, elapsed: float) -> None:  # continue a saved game that had been played for elapsed seconds
+        self.start_time = time.monotonic() - elapsed
+        self.resumed = True
+
+    def record(self, action: Action, cell: tuple[int, ...], version: int) -> None:  # log actions that did something
+        if self.recorder is not None and self.board.version != version:
+            self.recorder.record(round(self.game_time * 1000), action, cell)
+
+    def clicked(self, clicks: list[tuple[int, tuple[int, int], int]]) -> None:
+        # apply the (button, pos, time in ms) clicks queued since the last frame, ending the game at most once
         if self.over:
             return
-        x, y = self.pixel_to_grid(*pos)
-        if self.is_in_grid(x, y) and (self.grid_state[x][y] == TileState.none or
-                                      self.grid_state[x][y] == TileState.flagged):
-            if self.grid_state[x][y] == TileState.none:
-                self.grid_state[x][y] = TileState.flagged
-                self.tile_flagged += 1
-            elif self.grid_state[x][y] == TileState.flagged:
-                self.grid_state[x][y] = TileState.none
-                self.tile_flagged -= 1
-
-    def left_clicked_on(self, pos: tuple[int, int], player_click: bool = True) -> None:  # left click to clear
+        for button, pos, ms in clicks:
+            if button == 1:
+                self.left_click(pos, ms)
+            elif button == 3:
+                self.right_click(pos)
+            if self.over:
+                break
         if self.over:
+            self.finish()
+
+    def finish(self) -> None:  # the game just ended, by a click or by a diff from the race server
+        self.end_time = time.monotonic()
+        if self.board.won:
+            self.all_clear()
+        else:
+            self.game_over()
+        if self.recorder is not None and not self.resumed and self.game.data.get('record_replays', False):
+            self.recorder.save('./data/replays.dat')
+
+    def right_click(self, pos: tuple[int, int]) -> None:  # right click to flag
+        if self.table_area.collidepoint(pos):
+            cell = self.cell(*self.pixel_to_grid(*pos))
+            version = self.board.version
+            self.board.toggle_flag(cell)
+            self.record(Action.flag, cell, version)
+
+    def left_click(self, pos: tuple[int, int], ms: int) -> None:  # left click to clear
+        if not self.table_area.collidepoint(pos):
             return
-        x, y = self.pixel_to_grid(*pos)
-        if self.is_in_grid(x, y):
-            # normal left-click-to-clear
-            if self.grid_state[x][y] == TileState.none:
-                if not self.generated:
-                    self.generate((x, y))
-                    self.generated = True
-                if self.grid[x][y] == -1:
-                    self.game_over()
-                elif self.grid[x][y] == 0:  # bfs
-                    directions = ((-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1))
-                    queue: list[tuple[int, int]] = [(x, y)]
-                    visited = []
-                    for i in range(self.grid_size[0]):
-                        visited.append([False] * self.grid_size[1])
-                    while len(queue):
-                        sx, sy = queue.pop(0)
-                        visited[sx][sy] = True
-                        if self.grid[sx][sy] != -1 and self.grid_state[sx][sy] != TileState.cleared:
-                            self.grid_state[sx][sy] = TileState.cleared
-                            self.tile_cleared += 1
-                        if self.grid[sx][sy] > 0:
-                            continue
-                        for dx, dy in directions:
-                            ex, ey = sx + dx, sy + dy
-                            if (0 <= ex < self.grid_size[0] and 0 <= ey < self.grid_size[1]) and not visited[ex][ey]:
-                                if self.grid[ex][ey] >= 0:
-                                    queue.append((ex, ey))
-                                    visited[ex][ey] = True
-                else:
-                    self.grid_state[x][y] = TileState.cleared
-                    self.tile_cleared += 1
-                if player_click and self.tile_cleared + self.mine_total == self.grid_size[0] * self.grid_size[1]:
-                    self.all_clear()
-            # double-click to automatically clear nearby tiles
-            elif player_click and self.grid_state[x][y] == TileState.cleared:
-                if (x, y) in self.double_click_dict:
-                    del self.double_click_dict[(x, y)]
-                    count = 0
-                    directions = ((-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1))
-                    for dx, dy in directions:
-                        ex, ey = x + dx, y + dy
-                        if (0 <= ex < self.grid_size[0] and 0 <= ey < self.grid_size[1] and
-                                self.grid_state[ex][ey] == TileState.flagged):
-                            count += 1
-                    if count == self.grid[x][y]:
-                        for dx, dy in directions:
-                            ex, ey = x + dx, y + dy
-                            if self.grid_state[x][y] != 2:
-                                self.left_clicked_on(self.grid_to_pixel(ex, ey), False)
-                    if self.tile_cleared + self.mine_total == self.grid_size[0] * self.grid_size[1]:
-                        self.all_clear()
-                else:
-                    self.double_click_dict[(x, y)] = 0
+        cell = self.cell(*self.pixel_to_grid(*pos))
+        if not self.board.is_in_grid(cell):
+            return
+        version = self.board.version
+        # normal left-click-to-clear
+        if self.board.tile_state(cell) == TileState.none:
+            self.board.clear(cell)
+            self.record(Action.clear, cell, version)
+            if not self.board.generated:
+                self.pending_clear = cell
+        # double-click to automatically clear nearby tiles
+        elif self.board.tile_state(cell) == TileState.cleared:
+            if (self.last_click is not None and self.last_click[0] == cell
+                    and ms - self.last_click[1] <= self.double_click_ms):
+                self.last_click = None
+                self.board.chord(cell)
+                self.record(Action.chord, cell, version)
+            else:
+                self.last_click = (cell, ms)
+
+    def record_result(self) -> None:  # add the finished game to the statistics
+        if isinstance(self.board, Board):
+            self.game.stats.record(self.board.grid_size, self.board.mine_total, self.board.won, self.game_time,
+                                   self.board.tile_cleared)
 
     def game_over(self) -> None:  # mine triggered
-        self.over = True
         print('game over')
+        self.record_result()
         choice(self.game.sfx['explode']).play(fade_ms=100)
-        for i in range(self.grid_size[0]):
-            for j in range(self.grid_size[1]):
-                if self.grid[i][j] == -1:
-                    self.grid_state[i][j] = TileState.mine_visible
-                    self.anim_dict[(i, j)] = (
-                        Explosion(self.game.assets['explosion'], 3).scale_by(uniform(0.75, 1.25)),
-                        (random(), random())
-                    )
+        for i, j in self.animated_mines():
+            self.anim_dict[(i, j)] = (
+                Explosion(self.game.assets['explosion'], 3),
+                (random(), random())
+            )
+
+    def animated_mines(self) -> list[tuple[int, int]]:  # mines of the shown layer explode on game over
+        return [(pos[0], pos[1]) for pos in self.board.mine_positions() if list(pos[2:]) == self.layer]
 
     def all_clear(self) -> None:  # all mines are cleared
-        self.over = True
         print('all clear')
-        for i in range(self.grid_size[0]):
-            for j in range(self.grid_size[1]):
-                if self.grid[i][j] == -1 and self.grid_state[i][j] != TileState.flagged:
-                    self.grid_state[i][j] = TileState.flagged
-                    self.tile_flagged += 1
+        self.record_result()
 
     def wheel_clicked_on(self, pos: tuple[int, int]) -> None:  # TODO only for debugging
-        x, y = self.pixel_to_grid(*pos)
-        print(f'Tile({x},{y}): {self.grid[x][y]}, {self.grid_state[x][y]}')
+        cell = self.cell(*self.pixel_to_grid(*pos))
+        print(f'Tile{cell}: {self.board.tile_number(cell)}, {TileState(self.board.tile_state(cell))}')
 
-    def update(self) -> None:
-        if not self.over:
-            self.game_time += 1
+    def mouse_wheel(self, pos: tuple[int, int], steps: int) -> None:  # the whole board is always visible
+        pass
 
-        # handle double clicks
-        delete = set()
-        for key in self.double_click_dict:
-            self.double_click_dict[key] += 1
-            if self.double_click_dict[key] > self.double_click_time:
-                delete.add(key)
-        for key in delete:
-            del self.double_click_dict[key]
-        del delete
+    def mouse_dragged(self, rel: tuple[int, int]) -> None:
+        pass
+
+    def hint(self) -> None:  # point at a tile to clear next, moving to its layer if needed
+        self.hint_wanted = False
+        self.hint_cell = self.solver.hint()
+        if self.hint_cell is not None:
+            layer = list(self.board.position(self.hint_cell)[2:])
+            if layer != self.layer:
+                self.layer = layer
+                self.renderer.invalidate()
+
+    def heatmap(self) -> np.ndarray | None:  # probability buckets to tint the covered tiles with
+        if not self.show_heatmap:
+            return None
+        if self.solver.version != self.heat_version:
+            self.heat_version = self.solver.version
+            probability = self.solver.probability
+            self.heat = np.where(np.isnan(probability), no_heat,
+                                 np.rint(np.nan_to_num(probability) * heat_buckets)).astype(np.uint8)
+            self.heat = self.heat.reshape(self.grid_size)
+        return self.heat
+
+    def key_pressed(self, key: int) -> None:  # page up/down move through the layers, tab picks the axis
+        if key in (pygame.K_h, pygame.K_p) and self.local and self.solver is None:
+            self.solver = Solver(self.board)
+        if key == pygame.K_h and self.solver is not None:
+            self.hint_wanted = True
+        elif key == pygame.K_p and self.solver is not None:
+            self.show_heatmap = not self.show_heatmap
+        if not self.layer:
+            return
+        if key == pygame.K_TAB:
+            self.layer_axis = (self.layer_axis + 1) % len(self.layer)
+        elif key in (pygame.K_PAGEUP, pygame.K_PAGEDOWN):
+            step = 1 if key == pygame.K_PAGEUP else -1
+            size = self.grid_size[self.layer_axis + 2]
+            self.layer[self.layer_axis] = (self.layer[self.layer_axis] + step) % size
+            self.renderer.invalidate()
+
+    def idle_timeout(self, tick: float) -> float:  # seconds until the table needs another frame
+        if self.anim_dict or (self.solver is not None and self.solver.busy):
+            return 0
+        if self.pending_clear is not None:
+            return min(tick, 0.02)  # look for the first board often, the click is only shown once it arrives
+        return math.inf if self.over else tick  # the clock is shown every tick while it runs
+
+    def update(self) -> None:
+        if self.pending_clear is not None:
+            cell = self.pending_clear
+            version = self.board.version
+            self.board.clear(cell)
+            if self.board.generated:
+                self.pending_clear = None
+                self.record(Action.clear, cell, version)
+                if self.over:
+                    self.finish()
+        if self.solver is not None:
+            self.solver.update()
+            if self.hint_wanted and not self.solver.busy:
+                self.hint()
 
-        # draw the grid
         screen_size: tuple[int, int] = self.game.screen.get_size()
         self.top_border = (round(self.default_top_border * screen_size[1] / self.game.config['Graphics']['size'][1])
                            + self.border)
+        self.table_area = pygame.Rect(0, self.top_border, screen_size[0], screen_size[1] - self.top_border)
+        self.layout(screen_size)
+        self.game.dirty_rects.extend(self.draw_board())
+        self.draw_overlays()
+
+    def layout(self, screen_size: tuple[int, int]) -> None:  # fit the whole grid into the window
         table_size = (screen_size[0] - self.border * 2, screen_size[1] - self.border - self.top_border)
         if table_size[0] / self.grid_size[0] <= table_size[1] / self.grid_size[1]:
-            self.tile_size = round(table_size[0] / self.grid_size[0])
+            self.tile_size = max(1, round(table_size[0] / self.grid_size[0]))
             self.pos = [
                 self.border + 1,
                 round((self.top_border + 1) + table_size[1] / 2 - self.grid_size[1] * self.tile_size / 2),
             ]
         else:
-            self.tile_size = round(table_size[1] / self.grid_size[1])
+            self.tile_size = max(1, round(table_size[1] / self.grid_size[1]))
             self.pos = [
                 round((self.border + 1) + table_size[0] / 2 - self.grid_size[0] * self.tile_size / 2),
                 self.top_border + 1,
             ]
-        tile = pygame.transform.scale(self.game.assets['tile'], (self.tile_size, self.tile_size))
-        flag = pygame.transform.scale(self.game.assets['flag'], (self.tile_size, self.tile_size))
-        mine = pygame.transform.scale(self.game.assets['mine'], (self.tile_size, self.tile_size))
-        numbers = [pygame.transform.scale_by(sf, self.tile_size / sf.get_size()[1]) for sf in self.default_numbers]
-        for i in range(self.grid_size[0]):
-            for j in range(self.grid_size[1]):
-                pos = self.grid_to_pixel(i, j)
-                if self.grid_state[i][j] == TileState.cleared:
-                    if self.grid[i][j] > 0:
-                        text = numbers[self.grid[i][j] - 1]
-                        self.game.screen.blit(text, (
-                            pos[0] + self.tile_size / 2 - text.get_size()[0] * self.tile_size / text.get_size()[1] / 2,
-                            pos[1]
-                        ))
-                else:
-                    self.game.screen.blit(tile, pos)
-                    if self.grid_state[i][j] == TileState.flagged:
-                        self.game.screen.blit(flag, pos)
-                    elif self.grid_state[i][j] == TileState.mine_visible:
-                        self.game.screen.blit(mine, pos)
+
+    def draw_board(self) -> list[pygame.Rect]:  # redraw the tiles that changed, returns the repainted areas
+        if self.renderer.set_layout(self.tile_size, self.pos, self.grid_size) or self.game.full_redraw:
+            self.renderer.invalidate()
+            dirty = self.renderer.redraw(self.board, self.layer, self.heatmap())
+            dirty.append(self.renderer.rect)
+        else:
+            dirty = self.renderer.redraw(self.board, self.layer, self.heatmap())
+
+        # erase last frame's overlays along with the changed tiles
+        dirty = [area for area in (rect.clip(self.table_area) for rect in dirty + self.overlay_rects) if area]
+        for rect in dirty:
+            self.renderer.restore(self.game.screen, rect)
+        return dirty
+
+    def draw_overlays(self) -> None:
+        self.overlay_rects = []
 
         # display a rectangle to show nearby tiles
-        if not self.over:
+        if not self.over and self.table_area.collidepoint(pygame.mouse.get_pos()):
             x, y = self.pixel_to_grid(*pygame.mouse.get_pos())
             if self.is_in_grid(x, y):
-                pygame.draw.rect(
+                left = x - self.is_in_grid(x - 1, y)
+                top = y - self.is_in_grid(x, y - 1)
+                self.overlay_rects.append(pygame.draw.rect(
                     self.game.screen,
                     'white',
                     pygame.Rect(
-                        *self.grid_to_pixel((x - 1) if x > 0 else 0, (y - 1) if y > 0 else 0),
-                        self.tile_size * ((x > 0) + (x < self.grid_size[0] - 1) + 1),
-                        self.tile_size * ((y > 0) + (y < self.grid_size[1] - 1) + 1),
+                        *self.grid_to_pixel(left, top),
+                        self.tile_size * (x + self.is_in_grid(x + 1, y) - left + 1),
+                        self.tile_size * (y + self.is_in_grid(x, y + 1) - top + 1),
                     ),
                     2,
-                )
+                ))
+
+        # outline the hinted tile, green when it is known to be safe, until it is no longer covered
+        if self.hint_cell is not None:
+            cell = self.board.position(self.hint_cell)
+            if self.over or self.board.states[self.hint_cell] != TileState.none:
+                self.hint_cell = None
+            elif list(cell[2:]) == self.layer:
+                self.overlay_rects.append(pygame.draw.rect(
+                    self.game.screen,
+                    'green' if self.hint_cell in self.solver.safe else 'yellow',
+                    pygame.Rect(*self.grid_to_pixel(*cell[:2]), self.tile_size, self.tile_size),
+                    3,
+                ))
 
-        # update animations
+        # update animations, drawing the visible ones in one batch
+        screen_rect = self.game.screen.get_rect()
+        blits = []
         delete = set()
         for pos, (anim, offset) in self.anim_dict.items():
+            anim.advance()
             pixel_pos = self.grid_to_pixel(*pos)
-            anim.update(
-                self.game.screen,
-                (
-                    pixel_pos[0] + round(offset[0] * self.tile_size - self.tile_size),
-                    pixel_pos[1] + round(offset[1] * self.tile_size - self.tile_size)
-                ),
-                (self.tile_size * 2, self.tile_size * 2),
+            anim_rect = pygame.Rect(
+                pixel_pos[0] + round(offset[0] * self.tile_size - self.tile_size),
+                pixel_pos[1] + round(offset[1] * self.tile_size - self.tile_size),
+                self.tile_size * 2,
+                self.tile_size * 2,
             )
+            if anim_rect.colliderect(screen_rect):
+                blits.append((anim.frame(anim_rect.size), anim_rect.topleft))
+                self.overlay_rects.append(anim_rect)
             if anim.done:
                 delete.add(pos)
         for key in delete:
             del self.anim_dict[key]
         del delete
+        self.game.screen.blits(blits, False)
+        if len(self.overlay_rects) > self.renderer.max_tile_rects:
+            self.overlay_rects = [self.overlay_rects[0].unionall(self.overlay_rects)]
+        self.game.dirty_rects.extend(self.overlay_rects)
+
+
+class ChunkedMineTable(MineTable2D):  # view into a chunked board through a camera that can pan and zoom
+    def __init__(self, game, board: ChunkedBoard):
+        super().__init__(game, board)
+        self.board: ChunkedBoard = board
+        self.tile_size = 24
+        self.min_tile_size = 6
+        self.max_tile_size = 48
+        self.view = pygame.Rect(0, 0, 0, 0)  # screen area the tiles are drawn in
+        self.centered = False
+        self.sprites: dict[str, pygame.Surface] = {}
+        self.sprite_size = 0
+        self.covered = pygame.Surface((0, 0))  # shared by every chunk that has never been touched
+        self.chunk_surfaces: dict[tuple[int, int], tuple[int, pygame.Surface]] = {}  # chunk -> (version, surface)
+
+    @property
+    def chunk_pixels(self) -> int:
+        return self.board.chunk_size * self.tile_size
+
+    def layout(self, screen_size: tuple[int, int]) -> None:  # the camera is kept, only the view follows the window
+        self.view = pygame.Rect(self.border + 1, self.top_border + 1,
+                                screen_size[0] - self.border * 2, screen_size[1] - self.border - self.top_border)
+        if not self.centered:
+            self.centered = True
+            center = (0, 0) if self.board.grid_size is None else (self.board.grid_size[0] / 2,
+                                                                  self.board.grid_size[1] / 2)
+            self.pos = [round(self.view.centerx - center[0] * self.tile_size),
+                        round(self.view.centery - center[1] * self.tile_size)]
+        if self.tile_size != self.sprite_size:
+            self.game.glyphs.drop(self.sprite_size)
+            self.sprite_size = self.tile_size
+            for name in ('tile', 'flag', 'mine'):
+                self.sprites[name] = pygame.transform.scale(self.game.assets[name], (self.tile_size, self.tile_size))
+            self.covered = pygame.Surface((self.chunk_pixels, self.chunk_pixels), pygame.SRCALPHA)
+            self.covered.blits([(self.sprites['tile'], (x * self.tile_size, y * self.tile_size))
+                                for x in range(self.board.chunk_size) for y in range(self.board.chunk_size)], False)
+            self.chunk_surfaces.clear()
+
+    def chunk_surface(self, chunk: tuple[int, int]) -> pygame.Surface:
+        if chunk not in self.board.states:
+            return self.covered
+        version = self.board.chunk_versions.get(chunk, 0)
+        if chunk in self.chunk_surfaces and self.chunk_surfaces[chunk][0] == version:
+            return self.chunk_surfaces[chunk][1]
+        size = self.tile_size
+        surface = pygame.Surface((self.chunk_pixels, self.chunk_pixels), pygame.SRCALPHA)
+        states = self.board.states[chunk]
+        numbers = self.board.numbers.get(chunk)
+        blits = []
+        for x, y in zip(*(axis.tolist() for axis in states.nonzero())):
+            if states[x, y] == TileState.cleared:
+                if numbers[x, y] > 0:
+                    text = self.game.glyphs.glyph(str(numbers[x, y]), self.game.config['Color'][numbers[x, y] - 1],
+                                                  size)
+                    blits.append((text, (x * size + (size - text.get_size()[0]) // 2, y * size)))
+            else:
+                blits.append((self.sprites['tile'], (x * size, y * size)))
+                blits.append((self.sprites['flag' if states[x, y] == TileState.flagged else 'mine'],
+                              (x * size, y * size)))
+        for x, y in zip(*(axis.tolist() for axis in (states == TileState.none).nonzero())):
+            blits.append((self.sprites['tile'], (x * size, y * size)))
+        surface.blits(blits, False)
+        self.chunk_surfaces[chunk] = (version, surface)
+        return surface
+
+    def visible_chunks(self) -> list[tuple[int, int]]:
+        first = self.pixel_to_grid(*self.view.topleft)
+        last = self.pixel_to_grid(*self.view.bottomright)
+        size = self.board.chunk_size
+        return [(cx, cy) for cx in range(first[0] // size, last[0] // size + 1)
+                for cy in range(first[1] // size, last[1] // size + 1)]
+
+    def draw_board(self) -> list[pygame.Rect]:  # the camera may move at any time, so the whole view is redrawn
+        screen = self.game.screen
+        screen.blit(self.game.background, self.table_area, self.table_area)
+        clip = self.view
+        if self.board.grid_size is not None:
+            clip = clip.clip(pygame.Rect(self.pos, (self.board.grid_size[0] * self.tile_size,
+                                                    self.board.grid_size[1] * self.tile_size)))
+        screen.set_clip(clip)
+        visible = self.visible_chunks()
+        screen.blits([(self.chunk_surface(chunk), (self.pos[0] + chunk[0] * self.chunk_pixels,
+                                                   self.pos[1] + chunk[1] * self.chunk_pixels))
+                      for chunk in visible], False)
+        screen.set_clip(None)
+        for chunk in self.chunk_surfaces.keys() - set(visible):  # keep only the surfaces on screen
+            del self.chunk_surfaces[chunk]
+        self.overlay_rects = []
+        return [self.table_area]
+
+    def animated_mines(self) -> list[tuple[int, int]]:  # only the mines in view explode
+        size = self.board.chunk_size
+        return [(cx * size + int(x), cy * size + int(y)) for cx, cy in self.visible_chunks()
+                if (cx, cy) in self.board.mines for x, y in np.argwhere(self.board.mines[(cx, cy)])]
+
+    def mouse_wheel(self, pos: tuple[int, int], steps: int) -> None:  # zoom around the mouse
+        tile_size = min(self.max_tile_size, max(self.min_tile_size, self.tile_size + steps * 2))
+        self.pos = [round(pos[0] - (pos[0] - self.pos[0]) * tile_size / self.tile_size),
+                    round(pos[1] - (pos[1] - self.pos[1]) * tile_size / self.tile_size)]
+        self.tile_size = tile_size
+
+    def mouse_dragged(self, rel: tuple[int, int]) -> None:
+        self.pos = [self.pos[0] + rel[0], self.pos[1] + rel[1]]
+
+    def key_pressed(self, key: int) -> None:  # arrow keys pan by a few tiles
+        step = self.tile_size * 4
+        moves = {
+            pygame.K_LEFT: (step, 0),
+            pygame.K_RIGHT: (-step, 0),
+            pygame.K_UP: (0, step),
+            pygame.K_DOWN: (0, -step),
+        }
+        if key in moves:
+            self.mouse_dragged(moves[key])
@@ -0,0 +1,116 @@
+import cProfile
+import csv
+import pstats
+import time
+
+import numpy as np
+import pygame
+
+
+class FrameProfiler:  # per-phase frame timings in a ring buffer, with an overlay, csv dumps and cProfile captures
+    phases = ('events', 'background', 'draw_ui', 'mine_table', 'menu_bar', 'ui_update', 'overlays', 'display',
+              'checkpoint')
+
+    def __init__(self, game, capacity: int = 1024):
+        self.game = game
+        self.times = np.zeros((capacity, len(self.phases)))  # seconds spent in each phase, one row per frame
+        self.frames = 0  # frames recorded so far, the next one goes to row frames % capacity
+        self.row = np.zeros(len(self.phases))
+        self.last = 0.0
+        self.visible = False
+        self.rect = pygame.Rect(0, 0, 0, 0)  # area of the overlay on screen, repainted by the mine table
+        self.text_height = 14
+        self.graph_frames = 120
+        self.capture: cProfile.Profile | None = None
+        self.capture_left = 0
+
+    def begin(self) -> None:
+        self.row[:] = 0
+        self.last = time.perf_counter()
+
+    def mark(self, phase: str) -> None:  # the time since the last mark goes to a phase
+        now = time.perf_counter()
+        self.row[self.phases.index(phase)] += now - self.last
+        self.last = now
+
+    def end(self) -> None:
+        self.times[self.frames % len(self.times)] = self.row
+        self.frames += 1
+        if self.capture is not None:
+            self.capture_left -= 1
+            if self.capture_left <= 0:
+                self.stop_capture()
+
+    def recorded(self) -> np.ndarray:  # the buffered rows, oldest first
+        if self.frames < len(self.times):
+            return self.times[:self.frames]
+        return np.roll(self.times, -(self.frames % len(self.times)), axis=0)
+
+    def toggle(self) -> None:
+        self.visible = not self.visible
+        if not self.visible:  # let the mine table repaint where the overlay was
+            self.game.redraw_requested = True
+
+    def dump(self, path: str | None = None) -> str:  # write the buffer as csv in milliseconds, returns the path
+        path = path or time.strftime('frames_%Y%m%d_%H%M%S.csv')
+        rows = self.recorded() * 1000
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(('frame', *self.phases, 'total'))
+            first = self.frames - len(rows)
+            for i, row in enumerate(rows):
+                writer.writerow((first + i, *(f'{t:.4f}' for t in row), f'{row.sum():.4f}'))
+        print(f'frame timings written to {path}')
+        return path
+
+    def start_capture(self, frames: int = 300) -> None:  # run cProfile over the next frames
+        if self.capture is not None:
+            return
+        self.capture = cProfile.Profile()
+        self.capture_left = frames
+        self.capture.enable()
+
+    def stop_capture(self, path: str | None = None) -> None:
+        self.capture.disable()
+        path = path or time.strftime('frames_%Y%m%d_%H%M%S.prof')
+        self.capture.dump_stats(path)
+        print(f'profile written to {path}, slowest functions:')
+        pstats.Stats(self.capture).sort_stats('cumulative').print_stats(15)
+        self.capture = None
+
+    def erase(self) -> None:  # call before the mine table updates, so that it repaints last frame's overlay
+        if self.visible and self.rect:
+            self.game.mine_table.overlay_rects.append(self.rect)
+
+    def draw(self, screen: pygame.Surface) -> pygame.Rect | None:  # the overlay, returns its area when shown
+        if not self.visible:
+            return None
+        rows = self.recorded()
+        if not len(rows):
+            return None
+        totals = rows.sum(axis=1) * 1000
+        p50, p95, p99 = np.percentile(totals, (50, 95, 99))
+        lines = [['frame ms p50 ', *f'{p50:.2f}', ' p95 ', *f'{p95:.2f}', ' p99 ', *f'{p99:.2f}']]
+        phase_p95 = np.percentile(rows, 95, axis=0) * 1000
+        lines += [[f'{phase} p95 ', *f'{t:.2f}'] for phase, t in zip(self.phases, phase_p95)]
+
+        glyphs = self.game.glyphs
+        height = self.text_height
+        graph_height = height * 3
+        width = max(max(glyphs.width(line, 'white', height) for line in lines), self.graph_frames * 2)
+        self.rect = pygame.Rect(0, 0, width + 8, height * len(lines) + graph_height + 12)
+        self.rect.bottomleft = (4, screen.get_size()[1] - 4)
+        screen.fill((0, 0, 0), self.rect)
+        for i, line in enumerate(lines):
+            glyphs.draw(screen, (self.rect.x + 4, self.rect.y + 4 + i * height), line, 'white', height)
+
+        # the recent frames as bars, full height being two frames at 60 fps, with a line at one frame
+        bottom = self.rect.bottom - 4
+        scale = graph_height / 33.3
+        for i, total in enumerate(totals[-self.graph_frames:].tolist()):
+            x = self.rect.x + 4 + i * 2
+            color = 'green' if total < 16.7 else 'yellow' if total < 33.3 else 'red'
+            pygame.draw.line(screen, color, (x, bottom), (x, bottom - min(graph_height, round(total * scale))))
+        pygame.draw.line(screen, 'white', (self.rect.x + 4, bottom - round(16.7 * scale)),
+                         (self.rect.x + 4 + self.graph_frames * 2, bottom - round(16.7 * scale)))
+        return self.rect
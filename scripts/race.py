@@ -0,0 +1,504 @@
+import asyncio
+import math
+import queue
+import threading
+import time
+from collections.abc import Callable
+
+import numpy as np
+
+from scripts.board import Board, MINE, TileState
+from scripts.replay import Action, read_varint, write_varint
+
+# every message is its body length as a varint, then the body: a kind byte and its fields, numbers being varints
+# unless noted as bytes
+#   client -> server
+#     JOIN      dim byte, sizes, mines, players byte     wait for a race on such a board, leaving the current one
+#     CLICK     seq, action byte, flat index             an Action on a tile of the player's own board
+#   server -> client
+#     START     race id, player byte, players byte, dim byte, sizes, mines, diff
+#     DIFF      seq, status byte, diff                   the answer to every click, in the order they were sent
+#     PROGRESS  player byte, status byte, cleared        another player of the race moved on
+#     RESULT    players byte, then player byte, status byte, cleared, ms for each, best first
+#     ERROR     seq, code byte                           seq is 0 for a JOIN
+# a diff lists the tiles that changed since the last one sent, by increasing flat index: the tile count, a mode
+# byte, then (gap to the previous index, tile code) pairs, as raw bytes in PACKED mode and as varints otherwise
+JOIN, CLICK, START, DIFF, PROGRESS, RESULT, ERROR = range(7)
+VARINT, PACKED = 0, 1
+PLAYING, WON, LOST, LEFT = range(4)  # status of a player in a race
+BAD_BOARD, NOT_PLAYING, BAD_CELL = 1, 2, 3  # error codes
+# tile codes are the TileState of covered tiles, and CLEARED plus the number of cleared ones
+CLEARED = 4
+MAX_REQUEST = 64  # bytes in a client message at most, anything longer ends the connection
+
+
+def packet(body: bytearray) -> bytes:  # a message ready to be written to a stream
+    out = bytearray()
+    write_varint(out, len(body))
+    return bytes(out + body)
+
+
+async def read_message(reader: asyncio.StreamReader, limit: int | None = None) -> bytes:  # the body of a message
+    length = shift = 0
+    while True:
+        byte = (await reader.readexactly(1))[0]
+        length |= (byte & 0x7f) << shift
+        shift += 7
+        if byte < 0x80:
+            break
+        if shift > 35:
+            raise ValueError('message length too long')
+    if not length or limit is not None and length > limit:
+        raise ValueError(f'invalid message length {length}')
+    return await reader.readexactly(length)
+
+
+def tile_codes(board: Board, indices: np.ndarray) -> np.ndarray:
+    states = board.states[indices]
+    return np.where(states == TileState.cleared, board.cells[indices] + CLEARED, states).astype(np.uint8)
+
+
+def encode_diff(out: bytearray, indices: np.ndarray, codes: np.ndarray) -> None:
+    write_varint(out, len(indices))
+    gaps = np.empty(len(indices), np.int64)
+    gaps[:1] = indices[:1]
+    gaps[1:] = indices[1:] - indices[:-1] - 1
+    if not len(gaps) or gaps.max() < 256:  # a reveal changes a region of nearby tiles, so this is the usual case
+        out.append(PACKED)
+        pairs = np.empty((len(gaps), 2), np.uint8)
+        pairs[:, 0] = gaps
+        pairs[:, 1] = codes
+        out += pairs.tobytes()
+        return
+    out.append(VARINT)
+    for gap, code in zip(gaps.tolist(), codes.tolist()):
+        write_varint(out, gap)
+        write_varint(out, code)
+
+
+def decode_diff(data: bytes, pos: int) -> tuple[np.ndarray, np.ndarray, int]:  # indices, codes, next position
+    count, pos = read_varint(data, pos)
+    mode = data[pos]
+    pos += 1
+    if mode == PACKED:
+        pairs = np.frombuffer(data, np.uint8, count * 2, pos).reshape(-1, 2)
+        return np.cumsum(pairs[:, 0] + np.int64(1)) - 1, pairs[:, 1].copy(), pos + count * 2
+    pairs = np.zeros((count, 2), np.int64)
+    for i in range(count):
+        pairs[i, 0], pos = read_varint(data, pos)
+        pairs[i, 1], pos = read_varint(data, pos)
+    return np.cumsum(pairs[:, 0] + 1) - 1, pairs[:, 1].astype(np.uint8), pos
+
+
+def join_message(grid_size: tuple[int, ...], mine_total: int, players: int) -> bytes:
+    body = bytearray([JOIN, len(grid_size)])
+    for n in grid_size:
+        write_varint(body, n)
+    write_varint(body, mine_total)
+    body.append(players)
+    return packet(body)
+
+
+def click_message(seq: int, action: Action, index: int) -> bytes:
+    body = bytearray([CLICK])
+    write_varint(body, seq)
+    body.append(action)
+    write_varint(body, index)
+    return packet(body)
+
+
+def decode(body: bytes) -> tuple:  # a server message as a tuple starting with its kind, fields in message order
+    kind = body[0]
+    if kind == START:
+        race_id, pos = read_varint(body, 1)
+        number, players, dim = body[pos:pos + 3]
+        pos += 3
+        grid_size = []
+        for _ in range(dim):
+            n, pos = read_varint(body, pos)
+            grid_size.append(n)
+        mine_total, pos = read_varint(body, pos)
+        indices, codes, _ = decode_diff(body, pos)
+        return kind, race_id, number, players, tuple(grid_size), mine_total, indices, codes
+    if kind == DIFF:
+        seq, pos = read_varint(body, 1)
+        indices, codes, _ = decode_diff(body, pos + 1)
+        return kind, seq, body[pos], indices, codes
+    if kind == PROGRESS:
+        return kind, body[1], body[2], read_varint(body, 3)[0]
+    if kind == RESULT:
+        ranking = []
+        pos = 2
+        for _ in range(body[1]):
+            number, status = body[pos:pos + 2]
+            cleared, pos = read_varint(body, pos + 2)
+            ms, pos = read_varint(body, pos)
+            ranking.append((number, status, cleared, ms))
+        return kind, ranking
+    if kind == ERROR:
+        seq, pos = read_varint(body, 1)
+        return kind, seq, body[pos]
+    raise ValueError(f'unknown message kind {kind}')
+
+
+class Player:  # a connection to the server, in a race or waiting for one
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.lobby: tuple | None = None  # (grid size, mines, players) of the race waited for
+        self.race: Race | None = None
+        self.number = 0  # place in the race's player list
+        self.board: Board | None = None  # dropped once the race is over, so idle players hold no tiles
+        self.seen: np.ndarray | None = None  # tile states as of the last diff sent
+        self.status = PLAYING
+        self.ms = 0  # time from the start of the race to the end of the player's game
+
+    def send(self, data: bytes) -> None:
+        if not self.writer.is_closing():
+            self.writer.write(data)
+
+    def diff(self, out: bytearray) -> None:  # append the tiles changed since the last diff
+        changed = np.flatnonzero(self.board.states != self.seen)
+        self.seen[changed] = self.board.states[changed]
+        encode_diff(out, changed, tile_codes(self.board, changed))
+
+
+class Race:  # players on the same mines, each on a board of their own
+    def __init__(self, race_id: int, players: list[Player]):
+        self.race_id = race_id
+        self.players = players  # by number, including those who already left for another race
+        self.start = time.monotonic()
+        self.results: dict[int, tuple[int, int, int]] = {}  # player number -> (status, tiles cleared, ms) once done
+
+    def progress(self, player: Player) -> None:  # tell the others still in the race how far a player got
+        body = bytearray([PROGRESS, player.number, player.status])
+        write_varint(body, player.board.tile_cleared)
+        data = packet(body)
+        for other in self.players:
+            if other is not player and other.race is self:
+                other.send(data)
+
+    def ranking(self) -> list[tuple[int, int, int, int]]:  # (player, status, cleared, ms), winners by time first
+        return sorted(((n, *result) for n, result in self.results.items()), key=lambda r: (r[1] != WON, -r[2], r[3]))
+
+
+class RaceServer:  # hosts any number of races at once, checking every click on the player's own board
+    def __init__(self, max_tiles: int = 100_000, max_players: int = 8):
+        self.max_tiles = max_tiles  # bounds the memory of a race: 2 bytes a tile per player, about 16 shared
+        self.max_players = max_players
+        # players waiting for a race by its settings, with the board validated when the first of them joined
+        self.lobbies: dict[tuple, tuple[Board, list[Player]]] = {}
+        self.races: dict[int, Race] = {}
+        self.next_race = 1
+        self.connections = 0
+        self.actions = 0  # clicks handled so far
+
+    async def serve(self, host: str, port: int) -> asyncio.Server:
+        return await asyncio.start_server(self.handle, host, port, backlog=4096)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        player = Player(writer)
+        self.connections += 1
+        try:
+            while True:
+                body = await read_message(reader, MAX_REQUEST)
+                if body[0] == JOIN:
+                    self.join(player, body)
+                elif body[0] == CLICK:
+                    self.click(player, body)
+                else:
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError, IndexError):
+            pass  # a closed connection or a malformed message, the player leaves either way
+        finally:
+            self.connections -= 1
+            self.leave(player)
+            writer.close()
+
+    def error(self, player: Player, seq: int, code: int) -> None:
+        body = bytearray([ERROR])
+        write_varint(body, seq)
+        body.append(code)
+        player.send(packet(body))
+
+    def join(self, player: Player, body: bytes) -> None:
+        dim = body[1]
+        pos = 2
+        grid_size = []
+        for _ in range(dim):
+            n, pos = read_varint(body, pos)
+            grid_size.append(n)
+        mine_total, pos = read_varint(body, pos)
+        players = body[pos]
+        self.leave(player)
+        key = (tuple(grid_size), mine_total, players)
+        if key not in self.lobbies:
+            if not 1 <= players <= self.max_players or not 1 <= dim <= 4 or math.prod(grid_size) > self.max_tiles:
+                self.error(player, 0, BAD_BOARD)
+                return
+            try:
+                self.lobbies[key] = (Board(grid_size, mine_total), [])
+            except ValueError:
+                self.error(player, 0, BAD_BOARD)
+                return
+        board, waiting = self.lobbies[key]
+        waiting.append(player)
+        player.lobby = key
+        if len(waiting) == players:
+            del self.lobbies[key]
+            self.start(board, waiting)
+
+    def start(self, first: Board, players: list[Player]) -> None:
+        race = Race(self.next_race, players)
+        self.races[race.race_id] = race
+        self.next_race += 1
+        # one layout for the whole race, generated around the middle tile that every player starts from
+        middle = tuple(n // 2 for n in first.grid_size)
+        first.generate(middle)
+        for number, player in enumerate(players):
+            player.board = first.twin()
+            player.board.clear(middle)
+            player.lobby = None
+            player.race = race
+            player.number = number
+            player.status = WON if player.board.over else PLAYING
+            player.ms = 0
+            player.seen = np.zeros(first.tile_total, np.uint8)
+            body = bytearray([START])
+            write_varint(body, race.race_id)
+            body += bytes([number, len(players), first.dim])
+            for n in first.grid_size:
+                write_varint(body, n)
+            write_varint(body, first.mine_total)
+            player.diff(body)
+            player.send(packet(body))
+        if players[0].board.over:  # won by the opening alone, which is the same for everyone
+            for player in players:
+                self.finish(player)
+
+    def click(self, player: Player, body: bytes) -> None:
+        seq, pos = read_varint(body, 1)
+        action = body[pos]
+        index, _ = read_varint(body, pos + 1)
+        if player.race is None or player.status != PLAYING:
+            self.error(player, seq, NOT_PLAYING)
+            return
+        board = player.board
+        if action > Action.chord or index >= board.tile_total:
+            self.error(player, seq, BAD_CELL)
+            return
+        self.actions += 1
+        cell = board.position(index)
+        version = board.version
+        cleared = board.tile_cleared
+        if action == Action.clear:
+            board.clear(cell)
+        elif action == Action.flag:
+            board.toggle_flag(cell)
+        else:
+            board.chord(cell)
+        if board.over:
+            player.status = WON if board.won else LOST
+            player.ms = round((time.monotonic() - player.race.start) * 1000)
+        out = bytearray([DIFF])
+        write_varint(out, seq)
+        out.append(player.status)
+        if board.version != version:
+            player.diff(out)
+        else:  # a click that changed nothing, like a chord on an unsatisfied number
+            encode_diff(out, np.zeros(0, np.int64), np.zeros(0, np.uint8))
+        player.send(packet(out))
+        if board.over:
+            self.finish(player)
+        elif board.tile_cleared != cleared:
+            player.race.progress(player)
+
+    def finish(self, player: Player) -> None:  # the player's game ended, and the race with it once all are done
+        race = player.race
+        race.results[player.number] = (player.status, player.board.tile_cleared, player.ms)
+        race.progress(player)
+        if len(race.results) < len(race.players):
+            return
+        ranking = race.ranking()
+        body = bytearray([RESULT, len(ranking)])
+        for number, status, cleared, ms in ranking:
+            body += bytes([number, status])
+            write_varint(body, cleared)
+            write_varint(body, ms)
+        data = packet(body)
+        for p in race.players:
+            # those who joined another race meanwhile are left alone, as is one leaving for a new race right now
+            if p.race is race and p.status != LEFT:
+                p.send(data)
+                p.race = p.board = p.seen = None
+        del self.races[race.race_id]
+
+    def leave(self, player: Player) -> None:  # stop waiting or give up the race, on a new join or a disconnect
+        if player.lobby is not None:
+            waiting = self.lobbies[player.lobby][1]
+            waiting.remove(player)
+            if not waiting:
+                del self.lobbies[player.lobby]
+            player.lobby = None
+        if player.race is not None and player.status == PLAYING:
+            player.status = LEFT
+            player.ms = round((time.monotonic() - player.race.start) * 1000)
+            self.finish(player)
+        player.race = player.board = player.seen = None  # the race keeps the result, not the board
+
+    def waiting(self) -> int:
+        return sum(len(waiting) for _, waiting in self.lobbies.values())
+
+
+class RaceClient:  # one player's connection, for bots and the load test
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.seq = 0  # of the last click sent
+
+    @classmethod
+    async def connect(cls, host: str, port: int) -> 'RaceClient':
+        return cls(*await asyncio.open_connection(host, port))
+
+    def join(self, grid_size: tuple[int, ...], mine_total: int, players: int) -> None:
+        self.writer.write(join_message(grid_size, mine_total, players))
+
+    def click(self, action: Action, index: int) -> int:  # returns the seq the answer will carry
+        self.seq += 1
+        self.writer.write(click_message(self.seq, action, index))
+        return self.seq
+
+    async def receive(self) -> tuple:
+        return decode(await read_message(self.reader))
+
+    async def expect(self, *kinds: int) -> tuple:  # the next message of one of the kinds, skipping the others
+        while True:
+            message = await self.receive()
+            if message[0] in kinds:
+                return message
+
+    async def close(self) -> None:
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+class RemoteBoard(Board):  # a board mirrored from a race server, its clicks are sent there and applied as diffs
+    def __init__(self, address: str, grid_size: tuple[int, ...], mine_total: int, players: int = 2,
+                 notify: Callable[[], None] | None = None):
+        super().__init__(grid_size, mine_total)
+        host, _, port = address.rpartition(':')
+        self.players = players
+        self.notify = notify  # called on the network thread whenever a message arrives, to wake the game loop
+        self.inbox: queue.Queue = queue.Queue()  # message bodies for poll(), None once the connection is lost
+        self.race_id: int | None = None  # None between races
+        self.number = 0
+        self.progress: dict[int, tuple[int, int]] = {}  # player -> (status, tiles cleared)
+        self.ranking: list[tuple[int, int, int, int]] = []  # (player, status, tiles cleared, ms) of the last race
+        self.connected = True
+        self.client: RaceClient | None = None
+        # the connection lives on an event loop of its own thread, the game loop only ever touches the inbox
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_until_complete, args=(self._run(host, int(port)),),
+                                       daemon=True)
+        self.thread.start()
+
+    async def _run(self, host: str, port: int) -> None:
+        try:
+            self.client = await RaceClient.connect(host, port)
+            self.client.join(self.grid_size, self.mine_total, self.players)
+            while True:
+                self.inbox.put(await read_message(self.client.reader))
+                if self.notify is not None:
+                    self.notify()
+        except (OSError, asyncio.IncompleteReadError, ValueError) as error:
+            print(f'race server connection lost: {error}')
+            self.inbox.put(None)
+            if self.notify is not None:
+                self.notify()
+
+    def send(self, method: str, *args) -> None:  # call a RaceClient method on the network thread
+        if self.client is not None:
+            self.loop.call_soon_threadsafe(getattr(self.client, method), *args)
+
+    def poll(self) -> set[int]:  # apply the messages received since the last call, returns their kinds
+        kinds = set()
+        while True:
+            try:
+                body = self.inbox.get_nowait()
+            except queue.Empty:
+                return kinds
+            if body is None:
+                self.connected = False
+                self.race_id = None
+                continue
+            message = decode(body)
+            if message[0] in (DIFF, PROGRESS, RESULT) and self.race_id is None:
+                continue  # late news of a race this player already left for the next one
+            kinds.add(message[0])
+            if message[0] == START:
+                super().restart(True)
+                self.race_id, self.number, players = message[1:4]
+                self.generated = True
+                self.progress = {n: (PLAYING, 0) for n in range(players)}
+                self.ranking = []
+                self.apply(*message[6:], PLAYING)
+            elif message[0] == DIFF:
+                self.apply(message[3], message[4], message[2])
+            elif message[0] == PROGRESS:
+                self.progress[message[1]] = message[2:]
+            elif message[0] == RESULT:
+                self.ranking = message[1]
+                self.race_id = None
+            elif message[0] == ERROR:
+                print(f'race server refused a message: error {message[2]}')
+
+    def apply(self, indices: np.ndarray, codes: np.ndarray, status: int) -> None:
+        if len(indices):
+            self.version += 1
+            cleared = codes >= CLEARED
+            self.states[indices] = np.where(cleared, TileState.cleared, codes)
+            self.cells[indices[cleared]] = codes[cleared] - CLEARED
+            self.cells[indices[codes == TileState.mine_visible]] = MINE  # for the explosions
+            self.tile_cleared = int(np.count_nonzero(self.states == TileState.cleared))
+            self.tile_flagged = int(np.count_nonzero(self.states == TileState.flagged))
+        self.over = status != PLAYING
+        self.won = status == WON
+        self.progress[self.number] = (status, self.tile_cleared)
+
+    def click(self, action: Action, pos: tuple[int, ...]) -> None:
+        if self.race_id is not None and not self.over and self.is_in_grid(pos):
+            self.send('click', action, self.index(pos))
+
+    def clear(self, pos: tuple[int, ...]) -> None:
+        self.click(Action.clear, pos)
+
+    def chord(self, pos: tuple[int, ...]) -> None:
+        self.click(Action.chord, pos)
+
+    def toggle_flag(self, pos: tuple[int, ...]) -> None:
+        self.click(Action.flag, pos)
+
+    def restart(self, new: bool = True) -> None:  # join the next race, a race is never played twice
+        super().restart(True)
+        self.race_id = None
+        self.progress = {}
+        self.ranking = []
+        self.send('join', self.grid_size, self.mine_total, self.players)
+
+    def standing(self) -> str:  # the race in a line, for the window caption
+        if not self.connected:
+            return 'disconnected from the race server'
+        # a ranking may name players this board has no progress of, e.g. when it arrived after a restart
+        names = {n: 'you' if n == self.number else f'player {n + 1}' for n in self.progress}
+        safe = self.tile_total - self.mine_total
+        if self.ranking:
+            return 'race over: ' + ', '.join(
+                f'{i + 1}. {names.get(n, f"player {n + 1}")} '
+                + (f'{ms / 1000:.2f}s' if status == WON else f'{cleared}/{safe}')
+                for i, (n, status, cleared, ms) in enumerate(self.ranking))
+        if self.race_id is None:
+            return f'waiting for {self.players - 1} more player(s)' if self.players > 1 else 'starting'
+        labels = ('', ' won', ' lost', ' left')
+        return f'race {self.race_id}: ' + ', '.join(
+            f'{names.get(n, f"player {n + 1}")} {cleared}/{safe}{labels[status]}'
+            for n, (status, cleared) in sorted(self.progress.items()))
@@ -0,0 +1,225 @@
+import zlib
+from collections.abc import Iterator
+from enum import IntEnum, unique
+from pathlib import Path
+from typing import BinaryIO
+
+import numpy as np
+
+from scripts.board import Board, MINE
+
+# a replay file is a plain sequence of records: MAGIC, the body length as a varint, then the body
+MAGIC = b'MSRP'
+VERSION = 1
+SEEDED, BITMAP = 0, 1  # how a record stores the mines
+
+
+@unique
+class Action(IntEnum):
+    clear = 0
+    flag = 1
+    chord = 2
+
+
+def write_varint(out: bytearray, n: int) -> None:  # little-endian base 128, for any non-negative int
+    while n > 0x7f:
+        out.append(n & 0x7f | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def read_varint(data: bytes | memoryview, pos: int) -> tuple[int, int]:  # returns the value and the next position
+    n = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7f) << shift
+        shift += 7
+        if byte < 0x80:
+            return n, pos
+
+
+def zigzag(n: int) -> int:  # signed to unsigned, small magnitudes staying small
+    return n * 2 if n >= 0 else -n * 2 - 1
+
+
+def unzigzag(n: int) -> int:
+    return n // 2 if n % 2 == 0 else -(n + 1) // 2
+
+
+class ReplayRecorder:  # collects the actions of one game, with a snapshot of the tile states every few events
+    def __init__(self, board: Board, snapshot_every: int = 32):
+        self.board = board
+        self.snapshot_every = snapshot_every
+        self.events: list[tuple[int, int, int]] = []  # (milliseconds into the game, action, flat index)
+        self.snapshots: list[bytes] = []  # compressed states after every snapshot_every events
+        self.seed: int | None = None  # set when the mines come from the seed at the first clear
+        self.click: int | None = None  # the first clear, where the seeded mines were generated around
+
+    def start(self) -> None:  # forget the last game, called whenever a game starts
+        self.events.clear()
+        self.snapshots.clear()
+        self.click = None
+        # a board generated by its seed on the first clear can be stored as that seed, others need the bitmap
+        self.seed = self.board.seed if not self.board.generated and self.board.mine_source is None else None
+
+    def record(self, ms: int, action: Action, pos: tuple[int, ...]) -> None:  # call after applying the action
+        index = self.board.index(pos)
+        if action == Action.clear and self.click is None:
+            self.click = index
+        self.events.append((ms, action, index))
+        if len(self.events) % self.snapshot_every == 0:
+            self.snapshots.append(zlib.compress(self.board.states.tobytes()))
+
+    def encode(self) -> bytes:  # the record of the game so far, ready to be appended to a replay file
+        board = self.board
+        body = bytearray([VERSION, board.dim])
+        for n in board.grid_size:
+            write_varint(body, n)
+        write_varint(body, board.mine_total)
+        if self.seed is not None:
+            body.append(SEEDED)
+            write_varint(body, self.seed)
+            write_varint(body, self.click or 0)
+        else:
+            body.append(BITMAP)
+            body += np.packbits(board.cells == MINE).tobytes()
+
+        # events as time deltas with the action in the low bits, then zigzagged cell deltas
+        write_varint(body, len(self.events))
+        write_varint(body, self.snapshot_every)
+        last_ms = last_index = 0
+        for ms, action, index in self.events:
+            write_varint(body, (ms - last_ms) << 2 | action)
+            write_varint(body, zigzag(index - last_index))
+            last_ms, last_index = ms, index
+        for snapshot in self.snapshots:
+            write_varint(body, len(snapshot))
+            body += snapshot
+
+        record = bytearray(MAGIC)
+        write_varint(record, len(body))
+        return bytes(record + body)
+
+    def save(self, path: Path | str) -> None:  # append the game to a replay file
+        with open(path, 'ab') as file:
+            file.write(self.encode())
+
+
+class Replay:  # one decoded record; snapshots stay compressed until a seek needs them
+    def __init__(self, body: bytes):
+        data = memoryview(body)
+        version = data[0]
+        if version != VERSION:
+            raise ValueError(f'unsupported replay version {version}')
+        dim = data[1]
+        pos = 2
+        grid_size = []
+        for _ in range(dim):
+            n, pos = read_varint(data, pos)
+            grid_size.append(n)
+        self.grid_size = tuple(grid_size)
+        self.mine_total, pos = read_varint(data, pos)
+        tile_total = int(np.prod(self.grid_size))
+        self.seed: int | None = None
+        self.click = 0
+        self.mines: np.ndarray | None = None  # flat mine mask of bitmap records
+        kind = data[pos]
+        pos += 1
+        if kind == SEEDED:
+            self.seed, pos = read_varint(data, pos)
+            self.click, pos = read_varint(data, pos)
+        else:
+            size = (tile_total + 7) // 8
+            self.mines = np.unpackbits(np.frombuffer(data[pos:pos + size], np.uint8), count=tile_total).astype(bool)
+            pos += size
+
+        count, pos = read_varint(data, pos)
+        self.snapshot_every, pos = read_varint(data, pos)
+        self.times = np.zeros(count, np.int64)  # milliseconds into the game
+        self.actions = np.zeros(count, np.uint8)
+        self.cells = np.zeros(count, np.int64)
+        ms = index = 0
+        for i in range(count):
+            packed, pos = read_varint(data, pos)
+            delta, pos = read_varint(data, pos)
+            ms += packed >> 2
+            index += unzigzag(delta)
+            self.times[i], self.actions[i], self.cells[i] = ms, packed & 3, index
+        self.snapshots: list[memoryview] = []  # states after (i + 1) * snapshot_every events
+        while pos < len(data):
+            size, pos = read_varint(data, pos)
+            self.snapshots.append(data[pos:pos + size])
+            pos += size
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def board(self) -> Board:  # the board before the first event, with its mines in place
+        board = Board(self.grid_size, self.mine_total, self.seed)
+        if self.mines is not None:
+            board.set_mines(self.mines)
+        else:
+            board.generate(board.position(self.click))
+        return board
+
+
+def read_replays(file: BinaryIO) -> Iterator[Replay]:  # decode the records one at a time, however long the file
+    while True:
+        magic = file.read(len(MAGIC))
+        if len(magic) < len(MAGIC):
+            return
+        if magic != MAGIC:
+            raise ValueError('not a replay record')
+        length = shift = 0
+        while True:
+            byte = file.read(1)
+            if not byte:
+                return
+            length |= (byte[0] & 0x7f) << shift
+            shift += 7
+            if byte[0] < 0x80:
+                break
+        body = file.read(length)
+        if len(body) < length:  # the game was cut off while its record was being written
+            return
+        yield Replay(body)
+
+
+def iter_replays(path: Path | str) -> Iterator[Replay]:
+    with open(path, 'rb') as file:
+        yield from read_replays(file)
+
+
+class ReplayPlayer:  # plays a replay on a board, jumping to any point through the nearest snapshot
+    def __init__(self, replay: Replay):
+        self.replay = replay
+        self.board = replay.board()
+        self.position = 0  # events applied so far
+
+    def apply(self, i: int) -> None:  # apply event i to the board
+        pos = self.board.position(int(self.replay.cells[i]))
+        action = self.replay.actions[i]
+        if action == Action.clear:
+            self.board.clear(pos)
+        elif action == Action.flag:
+            self.board.toggle_flag(pos)
+        else:
+            self.board.chord(pos)
+
+    def seek(self, position: int) -> None:  # show the board after the first position events
+        position = max(0, min(position, len(self.replay)))
+        snapshot = min(position // self.replay.snapshot_every, len(self.replay.snapshots))
+        if position < self.position or snapshot * self.replay.snapshot_every > self.position:
+            if snapshot:
+                states = np.frombuffer(zlib.decompress(self.replay.snapshots[snapshot - 1]), np.uint8)
+                self.board.load_states(states)
+            else:
+                self.board.restart(False)
+            self.position = snapshot * self.replay.snapshot_every
+        while self.position < position:
+            self.apply(self.position)
+            self.position += 1
+
+    def seek_time(self, ms: int) -> None:  # show the board as it was a number of milliseconds into the game
+        self.seek(int(np.searchsorted(self.replay.times, ms, 'right')))
@@ -0,0 +1,102 @@
+import math
+import time
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from scripts.board import Board, MINE
+from scripts.replay import read_varint, write_varint
+from scripts.utils import ConfigManager, atomic_write
+
+# a save is MAGIC, then VERSION, the board size and mine count, the time played in ms and the compressed tiles:
+# the mine bitmap followed by the tile states at 2 bits each
+MAGIC = b'MSSV'
+VERSION = 1
+
+
+def encode_game(grid_size: tuple[int, ...], mine_total: int, cells: np.ndarray, states: np.ndarray,
+                elapsed_ms: int) -> bytes:
+    body = bytearray(MAGIC)
+    body += bytes([VERSION, len(grid_size)])
+    for n in grid_size:
+        write_varint(body, n)
+    write_varint(body, mine_total)
+    write_varint(body, elapsed_ms)
+    quads = np.zeros((len(states) + 3) // 4 * 4, np.uint8)  # four TileState values per byte
+    quads[:len(states)] = states
+    quads = quads.reshape(-1, 4)
+    packed = quads[:, 0] | quads[:, 1] << 2 | quads[:, 2] << 4 | quads[:, 3] << 6
+    body += zlib.compress(np.packbits(cells == MINE).tobytes() + packed.tobytes())
+    return bytes(body)
+
+
+def decode_game(data: bytes) -> tuple[Board, int]:  # the board with its mines and tiles, and the time played in ms
+    if data[:len(MAGIC)] != MAGIC or data[len(MAGIC)] != VERSION:
+        raise ValueError('not a saved game')
+    dim = data[len(MAGIC) + 1]
+    pos = len(MAGIC) + 2
+    grid_size = []
+    for _ in range(dim):
+        n, pos = read_varint(data, pos)
+        grid_size.append(n)
+    mine_total, pos = read_varint(data, pos)
+    elapsed_ms, pos = read_varint(data, pos)
+    board = Board(grid_size, mine_total)
+    tiles = np.frombuffer(zlib.decompress(data[pos:]), np.uint8)
+    mine_bytes = (board.tile_total + 7) // 8
+    board.set_mines(np.unpackbits(tiles[:mine_bytes], count=board.tile_total).astype(bool))
+    packed = tiles[mine_bytes:]
+    states = np.stack([packed & 3, packed >> 2 & 3, packed >> 4 & 3, packed >> 6], axis=1).reshape(-1)
+    board.load_states(states[:board.tile_total])
+    return board, elapsed_ms
+
+
+class Checkpointer:  # keeps the game in progress saved, encoding and writing it on a worker thread
+    def __init__(self, path: Path | str, interval: float = 1.0):
+        self.path = path if isinstance(path, Path) else Path(path)
+        self.interval = interval  # seconds between two saves at most
+        self.executor = ThreadPoolExecutor(1, 'checkpoint')
+        self.pending: Future | None = None
+        self.saved: tuple[int, int] | None = None  # (generation, version) of the board saved last
+        self.last = -interval  # time of the last save
+
+    def load(self) -> tuple[Board, int] | None:  # the saved game and its time played in ms, None without one
+        try:
+            return decode_game(self.path.read_bytes())
+        except (OSError, ValueError, IndexError, zlib.error):  # a save from an older version is dropped
+            return None
+
+    def update(self, board: Board, elapsed: float, force: bool = False) -> None:  # call once a frame
+        key = (board.generation, board.version)
+        if key == self.saved and not force:
+            return
+        now = time.monotonic()
+        if not force and (now - self.last < self.interval or self.pending is not None and not self.pending.done()):
+            return
+        self.saved = key
+        self.last = now
+        if board.generated and not board.over:
+            # only copies are taken on this thread, the worker compresses them while the next frames are drawn
+            self.pending = self.executor.submit(self.write, board.grid_size, board.mine_total, board.cells.copy(),
+                                                board.states.copy(), round(elapsed * 1000))
+        else:  # nothing to resume
+            self.pending = self.executor.submit(self.path.unlink, True)
+
+    def wait_time(self, board: Board) -> float:  # seconds until update() will save the board, inf if it is saved
+        if (board.generation, board.version) == self.saved:
+            return math.inf
+        return max(0.0, self.last + self.interval - time.monotonic())
+
+    def write(self, grid_size: tuple[int, ...], mine_total: int, cells: np.ndarray, states: np.ndarray,
+              elapsed_ms: int) -> None:
+        atomic_write(self.path, encode_game(grid_size, mine_total, cells, states, elapsed_ms))
+
+    def save_config(self, config: ConfigManager) -> None:  # write settings that changed, so a crash keeps them
+        if config.dirty:
+            self.executor.submit(atomic_write, config.path, config.encode())
+
+    def close(self, board: Board, elapsed: float) -> None:  # save one last time and wait for the writes to finish
+        self.update(board, elapsed, True)
+        self.executor.shutdown()
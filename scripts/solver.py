@@ -0,0 +1,530 @@
+import math
+import queue
+import threading
+import time
+import traceback
+from collections import deque
+
+import numpy as np
+
+from scripts.board import Board, TileState
+
+
+def solve_component(variables: tuple[int, ...], constraints: list[tuple[tuple[int, ...], int]],
+                    budget: int = 200_000) -> tuple[dict[int, int], dict[int, np.ndarray]] | None:
+    # enumerate the mine layouts of one frontier component; variables are covered tiles, constraints list the
+    # positions of their variables and how many mines those hold; returns, per mine count, the number of layouts
+    # and how often each variable is a mine in them, or None if the search ran out of budget
+    var_constraints: list[list[int]] = [[] for _ in variables]
+    for c, (members, _) in enumerate(constraints):
+        for v in members:
+            var_constraints[v].append(c)
+    # variables under the same numbers are interchangeable, so only the mine count of each such group is searched
+    groups: dict[tuple[int, ...], list[int]] = {}
+    for v, cells in enumerate(var_constraints):
+        groups.setdefault(tuple(cells), []).append(v)
+    group_constraints = list(groups)
+    group_vars = list(groups.values())
+    constraint_groups: list[list[int]] = [[] for _ in constraints]
+    for g, cells in enumerate(group_constraints):
+        for c in cells:
+            constraint_groups[c].append(g)
+    # visit the groups along the constraints so that every constraint is closed as early as possible
+    order = []
+    placed = [False] * len(group_vars)
+    for start in range(len(group_vars)):
+        if placed[start]:
+            continue
+        placed[start] = True
+        stack = [start]
+        while stack:
+            g = stack.pop()
+            order.append(g)
+            for c in group_constraints[g]:
+                for h in constraint_groups[c]:
+                    if not placed[h]:
+                        placed[h] = True
+                        stack.append(h)
+
+    need = [mines for _, mines in constraints]
+    open_vars = [len(members) for members, _ in constraints]
+    counts = [0] * len(group_vars)
+    layouts: dict[int, int] = {}
+    group_tallies: dict[int, list[int]] = {}
+
+    # depth first over the groups with an explicit stack, since a long frontier has more groups than python
+    # allows frames; tried[d] is the mine count last tried for the group at depth d, mines[d] and ways[d] what
+    # the groups above it hold
+    tried = [-1] * len(order)
+    mines = [0] * (len(order) + 1)
+    ways = [1] * (len(order) + 1)
+    steps = 0
+    depth = 0
+    entering = True
+    while depth >= 0:
+        if entering:
+            steps += 1
+            if steps > budget:
+                return None
+        if depth == len(order):
+            layouts[mines[depth]] = layouts.get(mines[depth], 0) + ways[depth]
+            tally = group_tallies.setdefault(mines[depth], [0] * len(group_vars))
+            for g, k in enumerate(counts):
+                tally[g] += ways[depth] * k
+            depth -= 1
+            entering = False
+            continue
+        g = order[depth]
+        size = len(group_vars[g])
+        cells = group_constraints[g]
+        if entering:
+            for c in cells:
+                open_vars[c] -= size
+            tried[depth] = -1
+        else:  # back from the deeper groups, take back the count tried here
+            for c in cells:
+                need[c] += tried[depth]
+        k = tried[depth] + 1
+        while k <= size and any(need[c] < k or need[c] - k > open_vars[c] for c in cells):
+            k += 1
+        if k > size:
+            counts[g] = 0
+            for c in cells:
+                open_vars[c] += size
+            depth -= 1
+            entering = False
+            continue
+        tried[depth] = counts[g] = k
+        for c in cells:
+            need[c] -= k
+        mines[depth + 1] = mines[depth] + k
+        ways[depth + 1] = ways[depth] * math.comb(size, k)
+        depth += 1
+        entering = True
+
+    tallies = {}
+    for mines, tally in group_tallies.items():
+        tallies[mines] = np.zeros(len(variables))
+        for vs, hits in zip(group_vars, tally):
+            tallies[mines][vs] = hits / len(vs)
+    return layouts, tallies
+
+
+def forced_cells(count: int, constraints: list[tuple[tuple[int, ...], int]], budget: int = 20_000,
+                 whole_limit: int = 64) -> tuple[list[int], list[int]]:
+    # positions of the variables that are safe or mines in every layout, found by looking for a layout with each
+    # variable set either way; cheaper than counting layouts. Components above whole_limit variables only search
+    # the variables sharing a number with the one tested, so a deduction there may be missed but is never wrong,
+    # and a variable is left undecided when its search runs out of budget
+    var_constraints: list[list[int]] = [[] for _ in range(count)]
+    for c, (members, _) in enumerate(constraints):
+        for v in members:
+            var_constraints[v].append(c)
+    value = [-1] * count
+    need = [mines for _, mines in constraints]
+    open_vars = [len(members) for members, _ in constraints]
+    trail: list[int] = []  # assigned variables in order, to undo back to a mark
+    scope = [False] * count  # variables the current search may assign
+    steps = 0
+
+    def assign(v: int, x: int) -> bool:  # assign and propagate the numbers that become decided, False if stuck
+        stack = [(v, x)]
+        while stack:
+            v, x = stack.pop()
+            if value[v] != -1:
+                if value[v] != x:
+                    return False
+                continue
+            value[v] = x
+            trail.append(v)
+            stuck = False
+            for c in var_constraints[v]:  # every count is updated before giving up, so that undo stays exact
+                need[c] -= x
+                open_vars[c] -= 1
+                if need[c] < 0 or need[c] > open_vars[c]:
+                    stuck = True
+                elif open_vars[c] and need[c] in (0, open_vars[c]):
+                    stack.extend((w, int(need[c] > 0)) for w in constraints[c][0] if value[w] == -1 and scope[w])
+            if stuck:
+                return False
+        return True
+
+    def undo(mark: int) -> None:
+        while len(trail) > mark:
+            v = trail.pop()
+            for c in var_constraints[v]:
+                need[c] += value[v]
+                open_vars[c] += 1
+            value[v] = -1
+
+    def search(order: list[int], i: int) -> bool:
+        nonlocal steps
+        while i < len(order) and value[order[i]] != -1:
+            i += 1
+        if i == len(order):
+            return True
+        steps += 1
+        if steps > budget:
+            raise OverflowError
+        for x in (0, 1):
+            mark = len(trail)
+            if assign(order[i], x) and search(order, i + 1):
+                return True
+            undo(mark)
+        return False
+
+    whole = count <= whole_limit
+
+    def layout(v: int, x: int) -> list[int] | None | bool:  # a layout with v set to x, searched outwards from v
+        nonlocal steps
+        order = [v]
+        placed = {v}
+        for w in order:
+            for c in var_constraints[w]:
+                for u in constraints[c][0]:
+                    if u not in placed:
+                        placed.add(u)
+                        order.append(u)
+            if not whole:  # the numbers around v's neighbours only bound their sums
+                break
+        for w in order:
+            scope[w] = True
+        steps = 0
+        try:
+            found = assign(v, x) and search(order, 0)
+        except OverflowError:
+            found = None
+        result = list(value) if found else found
+        undo(0)
+        for w in order:
+            scope[w] = False
+        return result
+
+    seen = [[False, False] for _ in range(count)]
+    undecided = set()
+    for v in range(count):
+        for x in (0, 1):
+            if seen[v][x] or v in undecided:
+                continue
+            found = layout(v, x)
+            if found is None:
+                undecided.add(v)
+            elif found and whole:  # a complete layout shows every one of its values to be possible
+                for w, y in enumerate(found):
+                    if y != -1:  # outside the part of the constraints connected to v
+                        seen[w][y] = True
+            elif found:
+                seen[v][x] = True
+    safe = [v for v in range(count) if v not in undecided and seen[v] == [True, False]]
+    mines = [v for v in range(count) if v not in undecided and seen[v] == [False, True]]
+    return safe, mines
+
+
+def analyse_component(variables: tuple[int, ...], constraints: list[tuple[tuple[int, ...], int]],
+                      probabilities: bool = True) -> tuple[list[int], list[int], tuple | None]:
+    # safe and mine positions of a component, with its layout counts when probabilities are wanted and affordable
+    enumeration = solve_component(variables, constraints) if probabilities else None
+    if not enumeration or not enumeration[0]:  # out of budget, or no layout fits after a wrong flag
+        return *forced_cells(len(variables), constraints), None
+    layouts, tallies = enumeration
+    hits = sum(tallies.values())
+    layout_total = sum(layouts.values())
+    return (np.flatnonzero(hits == 0).tolist(), np.flatnonzero(hits == layout_total).tolist(), enumeration)
+
+
+class Solver:  # keeps the logical state of a board's frontier up to date and estimates mine probabilities
+    def __init__(self, board: Board, background: bool = True, probabilities: bool = True):
+        self.board = board
+        # follow the board, enumerate and combine on a worker thread, else right away in update; the game only
+        # hands the worker copies of the tile states and swaps in the finished results, so that the bookkeeping
+        # of a large frontier never holds up a frame
+        self.background = background
+        self.probabilities = probabilities  # count layouts for the probabilities, else only look for forced tiles
+
+        # the frontier as last followed, only touched by the worker when there is one
+        self.seen_states = np.zeros_like(board.states)  # so that the tiles of a resumed game count as changed
+        self.seen_generation = board.generation
+        self.remaining = board.mine_total  # mines not flagged
+        self.over = False
+        self.is_constraint = np.zeros(board.tile_total, bool)
+        self.constraints: dict[int, tuple[tuple[int, ...], int]] = {}  # numbered tile -> (covered tiles, mines left)
+        self.var_constraints: dict[int, set[int]] = {}  # covered tile -> numbered tiles around it
+        self.component_of: dict[int, int] = {}  # covered tile -> id of its frontier component
+        self.in_frontier = np.zeros(board.tile_total, bool)  # the covered tiles of component_of
+        self.components: dict[int, tuple[int, ...]] = {}  # component id -> covered tiles
+        self.results: dict[int, tuple] = {}  # component id -> (safe, mines, layout counts or None), once solved
+        self.unsolved: deque[tuple[int, list]] = deque()  # (component id, its constraints) waiting to be solved
+        self.next_id = 0
+
+        # running totals of the combination, so that only the components that changed are weighed again
+        self.expected: dict[int, float] = {}  # component id -> mines expected in it
+        self.expected_total = 0.0
+        self.reweigh: set[int] = set()  # components to weigh at the next combination
+        self.weighed_odds = math.nan  # log odds of a mine away from the frontier when all were last weighed
+        self.known_safe: set[int] = set()
+        self.known_mines: set[int] = set()
+        self.chances = np.full(board.tile_total, np.nan, np.float32)
+
+        # what the game reads, swapped in whole by update
+        self.safe: set[int] = set()  # covered tiles proven to be safe
+        self.mines: set[int] = set()  # covered tiles proven to be mines
+        self.probability = np.full(board.tile_total, np.nan, np.float32)  # nan for tiles that are not covered
+        self.version = 0  # bumped whenever the probabilities change
+        self.handed: tuple[int, int] | None = None  # (generation, version) of the board last handed over
+        self.solved: tuple[int, int] | None = None  # the same once every component of it was solved
+
+        self.tasks: queue.Queue = queue.Queue()  # board snapshots for the worker, only the newest one counts
+        self.done: queue.Queue = queue.Queue()  # results for update to swap in
+        if self.background:
+            threading.Thread(target=self._work, daemon=True).start()
+
+    @property
+    def busy(self) -> bool:  # the results do not cover the board as it is yet
+        return self.solved != self.handed
+
+    def _work(self) -> None:
+        key = None
+        while True:
+            try:  # wait for a change, unless there are components left to solve
+                snapshot = self.tasks.get(block=not self.unsolved)
+            except queue.Empty:
+                snapshot = None
+            while not self.tasks.empty():
+                snapshot = self.tasks.get()
+            try:
+                if snapshot is not None:
+                    key = snapshot[0]
+                    self._follow(*snapshot)
+                else:  # show the probabilities now and then while a large frontier is solved
+                    deadline = time.monotonic() + 0.1
+                    while self.unsolved and self.tasks.empty() and time.monotonic() < deadline:
+                        self._solve()
+            except Exception:  # a component that could not be solved is left out, the solver carries on with the rest
+                traceback.print_exc()
+            try:
+                self._combine()
+            except Exception:
+                traceback.print_exc()
+            self.done.put((key, not self.unsolved, set(self.known_safe), set(self.known_mines), self.chances.copy()))
+
+    def update(self) -> None:  # hand over the board after reveals and flags, then swap in the finished results
+        board = self.board
+        key = (board.generation, board.version)
+        if key != self.handed:
+            self.handed = key
+            if self.background:
+                self.tasks.put((key, board.states.copy(), board.tile_flagged, board.over))
+            else:
+                self._follow(key, board.states, board.tile_flagged, board.over)
+                while self.unsolved:
+                    self._solve()
+                self._combine()
+                self.done.put((key, True, self.known_safe, self.known_mines, self.chances))
+        result = None
+        while not self.done.empty():
+            result = self.done.get()
+        # the numbers of an older generation are gone, and the worker may even have read them half replaced
+        if result is not None and result[0][0] == board.generation:
+            key, solved, self.safe, self.mines, self.probability = result
+            self.solved = key if solved else None
+            self.version += 1
+
+    def _follow(self, key: tuple[int, int], states: np.ndarray, flagged: int, over: bool) -> None:
+        if key[0] != self.seen_generation:  # new numbers, so every uncovered tile counts as changed
+            self.seen_generation = key[0]
+            changed = np.flatnonzero((states != TileState.none) | (self.seen_states != TileState.none))
+        else:
+            changed = np.flatnonzero(states != self.seen_states)
+        self.seen_states[:] = states
+        self.remaining = self.board.mine_total - flagged
+        self.over = over
+        if len(changed):
+            self._refresh(changed)
+
+    def _affected(self, changed: np.ndarray) -> np.ndarray:  # changed tiles and the tiles around them
+        board = self.board
+        if len(changed) <= 256:
+            return np.unique(np.concatenate([changed] + [board.neighbours(int(c)) for c in changed]))
+        mask = np.zeros(board.grid_size, bool)
+        mask.reshape(-1)[changed] = True
+        grown = mask.copy()
+        for tiles, neighbours in board.neighbour_slices:
+            grown[tiles] |= mask[neighbours]
+        return np.flatnonzero(grown)
+
+    def _refresh(self, changed: np.ndarray) -> None:
+        board = self.board
+        states = self.seen_states
+        affected = self._affected(changed)
+        dirty: set[int] = set()
+
+        # drop the constraints of the affected tiles, then rebuild those of numbered tiles next to covered ones
+        for cell in affected[self.is_constraint[affected]].tolist():
+            members, _ = self.constraints.pop(cell)
+            self.is_constraint[cell] = False
+            for v in members:
+                self.var_constraints[v].discard(cell)
+                if not self.var_constraints[v]:
+                    del self.var_constraints[v]
+            dirty.update(members)
+        candidates = affected[(states[affected] == TileState.cleared) & (board.cells[affected] > 0)]
+        covered, flag = int(TileState.none), int(TileState.flagged)  # enum lookups are slow in this loop
+        if not self.over:
+            for cell in candidates.tolist():
+                neighbours = board.neighbours(cell)
+                around = states[neighbours]
+                members = tuple(neighbours[around == covered].tolist())
+                if not members:
+                    continue
+                flagged = int(np.count_nonzero(around == flag))
+                self.constraints[cell] = (members, int(board.cells[cell]) - flagged)
+                self.is_constraint[cell] = True
+                for v in members:
+                    self.var_constraints.setdefault(v, set()).add(cell)
+                dirty.update(members)
+
+        # recompute the components the dirty tiles belong to, now or after the change
+        for v in list(dirty):
+            component = self.component_of.get(v)
+            if component in self.components:
+                variables = self.components.pop(component)
+                dirty.update(variables)
+                self.results.pop(component, None)
+                self.expected_total -= self.expected.pop(component)
+                self.reweigh.discard(component)
+                self.known_safe.difference_update(variables)
+                self.known_mines.difference_update(variables)
+        for v in dirty:
+            self.component_of.pop(v, None)
+        self.in_frontier[list(dirty)] = False
+        for start in dirty:
+            if start not in self.var_constraints or start in self.component_of:
+                continue
+            component = self.next_id
+            self.next_id += 1
+            variables = []
+            cells = set()
+            self.component_of[start] = component
+            stack = [start]
+            while stack:
+                v = stack.pop()
+                variables.append(v)
+                for cell in self.var_constraints[v]:
+                    if cell in cells:
+                        continue
+                    cells.add(cell)
+                    for w in self.constraints[cell][0]:
+                        if w not in self.component_of:
+                            self.component_of[w] = component
+                            stack.append(w)
+            self.components[component] = tuple(variables)
+            self.in_frontier[variables] = True
+            # until its layouts are counted, a component is expected to hold what its numbers spread over it
+            self.expected[component] = sum(self.constraints[cell][1] / len(self.constraints[cell][0])
+                                           for cell in cells)
+            self.expected_total += self.expected[component]
+            self.reweigh.add(component)
+            local = {v: i for i, v in enumerate(variables)}
+            self.unsolved.append((component, [(tuple(local[v] for v in self.constraints[cell][0]),
+                                               self.constraints[cell][1]) for cell in cells]))
+
+    def _solve(self) -> None:  # enumerate the next waiting component, unless it was replaced meanwhile
+        component, constraints = self.unsolved.popleft()
+        if component not in self.components:
+            return
+        variables = self.components[component]
+        result = analyse_component(variables, constraints, self.probabilities)
+        self.results[component] = result
+        self.known_safe.update(variables[i] for i in result[0])
+        self.known_mines.update(variables[i] for i in result[1])
+        self.reweigh.add(component)
+
+    def _combine(self) -> None:  # turn the component layouts into probabilities
+        covered = self.seen_states == TileState.none
+        outside = int(np.count_nonzero(covered)) - len(self.component_of)  # covered tiles away from the frontier
+        # each component's layouts are weighed by the ways to place the other mines away from the frontier, taking
+        # the other components at their expected mine counts. Those ways hardly change while the mine density away
+        # from the frontier stays put, so on large frontiers only the changed components are weighed again until
+        # the density moved; small ones are always weighed again, so that the expected counts settle
+        for component in self.reweigh:
+            self._weigh(component, outside)
+        self.reweigh.clear()
+        drifted = not self.unsolved and not abs(self._odds(outside) - self.weighed_odds) < 0.01
+        if len(self.components) <= 256 or drifted:
+            for component in self.components:
+                self._weigh(component, outside)
+            self.weighed_odds = self._odds(outside)
+
+        self.chances[~covered] = np.nan
+        if outside > 0:
+            self.chances[covered & ~self.in_frontier] = min(1.0, max(0.0, (self.remaining - self.expected_total)
+                                                                         / outside))
+
+    def _odds(self, outside: int) -> float:  # log odds of a mine on a covered tile away from the frontier
+        outside = max(outside, 0)
+        away = min(max(self.remaining - self.expected_total, 0), outside)
+        return math.log((away + 0.5) / (outside - away + 0.5))
+
+    def _weigh(self, component: int, outside: int) -> None:  # the probabilities of one component's tiles
+        variables = self.components[component]
+        result = self.results.get(component)
+        if not result or not result[2]:  # not counted (yet): fall back to what single numbers tell
+            self.chances[list(variables)] = [max(self.constraints[cell][1] / len(self.constraints[cell][0])
+                                                 for cell in self.var_constraints[v]) for v in variables]
+        else:
+            layouts, tallies = result[2]
+            others = self.remaining - (self.expected_total - self.expected[component])
+            ways = {m: self._log_ways(outside, others - m) for m in layouts}
+            top = max(ways.values())
+            if top == -math.inf:  # inconsistent with the mines left, e.g. after a wrong flag
+                weights = dict(layouts)
+            else:
+                weights = {m: n * math.exp(ways[m] - top) for m, n in layouts.items()}
+            weight_total = sum(weights.values())
+            expected = sum(m * w for m, w in weights.items()) / weight_total
+            self.expected_total += expected - self.expected[component]
+            self.expected[component] = expected
+            self.chances[list(variables)] = sum(tallies[m] / layouts[m] * w for m, w in weights.items()) / weight_total
+        if result:
+            safe, mines, _ = result
+            self.chances[[variables[i] for i in safe]] = 0
+            self.chances[[variables[i] for i in mines]] = 1
+
+    @staticmethod
+    def _log_ways(n: int, k: float) -> float:  # log of the ways to place k mines on n tiles
+        k = round(k)
+        if k < 0 or k > n:
+            return -math.inf
+        return math.lgamma(n + 1) - math.lgamma(k + 1) - math.lgamma(n - k + 1)
+
+    def hint(self) -> int | None:  # a covered tile to clear next: a safe one if known, else the least risky
+        if self.board.over:
+            return None
+        if not self.board.generated:  # the first click is always safe
+            return self.board.index(tuple(n // 2 for n in self.board.grid_size))
+        safe = [v for v in self.safe if self.board.states[v] == TileState.none]
+        if safe:
+            return min(safe)
+        chances = np.where(self.board.states == TileState.none, self.probability, np.nan)
+        if np.all(np.isnan(chances)):
+            return None
+        return int(np.nanargmin(chances))
+
+
+def solvable(board: Board, start: tuple[int, ...]) -> bool:  # decides if a generated board is cleared by logic alone
+    board.restart(False)
+    solver = Solver(board, background=False, probabilities=False)
+    board.clear(start)
+    while not board.over:
+        solver.update()
+        covered = board.states == TileState.none
+        safe = [v for v in solver.safe if covered[v]]
+        if not safe and len(solver.mines) == board.mine_total:  # every mine is known, so the rest is safe
+            safe = [v for v in np.flatnonzero(covered).tolist() if v not in solver.mines]
+        if not safe:
+            break
+        for v in safe:
+            board.clear(board.position(v))
+    won = board.won
+    board.restart(False)
+    return won
@@ -0,0 +1,163 @@
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import pygame
+
+# finished games, and a summary per board configuration that a trigger keeps up to date on every insert, so that
+# the stats screen never has to scan the games
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    size TEXT NOT NULL,
+    mines INTEGER NOT NULL,
+    won INTEGER NOT NULL,
+    duration_ms INTEGER NOT NULL,
+    cleared INTEGER NOT NULL,
+    finished REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS games_config ON games (size, mines, won, duration_ms);
+CREATE INDEX IF NOT EXISTS games_finished ON games (finished);
+
+CREATE TABLE IF NOT EXISTS summary (
+    size TEXT NOT NULL,
+    mines INTEGER NOT NULL,
+    played INTEGER NOT NULL,
+    won INTEGER NOT NULL,
+    best_ms INTEGER,
+    won_ms INTEGER NOT NULL,
+    streak INTEGER NOT NULL,
+    best_streak INTEGER NOT NULL,
+    last_finished REAL NOT NULL,
+    PRIMARY KEY (size, mines)
+);
+
+CREATE TRIGGER IF NOT EXISTS games_summary AFTER INSERT ON games BEGIN
+    INSERT INTO summary VALUES (new.size, new.mines, 1, new.won, CASE WHEN new.won THEN new.duration_ms END,
+                                new.won * new.duration_ms, new.won, new.won, new.finished)
+    ON CONFLICT (size, mines) DO UPDATE SET
+        played = played + 1,
+        won = won + new.won,
+        best_ms = CASE WHEN new.won AND (best_ms IS NULL OR new.duration_ms < best_ms) THEN new.duration_ms
+                       ELSE best_ms END,
+        won_ms = won_ms + new.won * new.duration_ms,
+        streak = CASE WHEN new.won THEN streak + 1 ELSE 0 END,
+        best_streak = max(best_streak, CASE WHEN new.won THEN streak + 1 ELSE 0 END),
+        last_finished = new.finished;
+END;
+'''
+
+
+def config_key(grid_size: tuple[int, ...]) -> str:
+    return 'x'.join(map(str, grid_size))
+
+
+class StatsStore:  # finished games in a local sqlite database, inserted in batches on a worker thread
+    def __init__(self, path: Path | str, batch: int = 256):
+        self.path = path if isinstance(path, Path) else Path(path)
+        self.batch = batch  # games inserted in one transaction at most
+        self.written = 0  # games committed so far, readers refresh when it moves
+        self.games: queue.Queue = queue.Queue()  # rows to insert, None to stop
+        connection = sqlite3.connect(self.path)
+        connection.execute('PRAGMA journal_mode = WAL')  # the stats screen reads while the worker writes
+        connection.executescript(SCHEMA)
+        connection.close()
+        self.reader = sqlite3.connect(self.path)
+        self.worker = threading.Thread(target=self._work, daemon=True)
+        self.worker.start()
+
+    def record(self, grid_size: tuple[int, ...], mine_total: int, won: bool, duration: float, cleared: int) -> None:
+        self.games.put((config_key(grid_size), mine_total, int(won), round(duration * 1000), cleared, time.time()))
+
+    def _work(self) -> None:
+        connection = sqlite3.connect(self.path)
+        running = True
+        while running:
+            rows = [self.games.get()]
+            while len(rows) < self.batch:  # take whatever else is queued along
+                try:
+                    rows.append(self.games.get_nowait())
+                except queue.Empty:
+                    break
+            if None in rows:
+                running = False
+                rows = [row for row in rows if row is not None]
+            if rows:
+                with connection:
+                    connection.executemany('INSERT INTO games (size, mines, won, duration_ms, cleared, finished) '
+                                           'VALUES (?, ?, ?, ?, ?, ?)', rows)
+                self.written += len(rows)
+        connection.close()
+
+    def summary(self) -> list[tuple]:  # (size, mines, played, won, best ms, mean winning ms, streak, best streak)
+        return self.reader.execute(
+            'SELECT size, mines, played, won, best_ms, won_ms / max(won, 1), streak, best_streak FROM summary '
+            'ORDER BY last_finished DESC').fetchall()
+
+    def best_times(self, grid_size: tuple[int, ...], mine_total: int, limit: int = 5) -> list[int]:  # in ms
+        return [row[0] for row in self.reader.execute(
+            'SELECT duration_ms FROM games WHERE size = ? AND mines = ? AND won = 1 ORDER BY duration_ms LIMIT ?',
+            (config_key(grid_size), mine_total, limit))]
+
+    def close(self) -> None:  # insert the queued games and stop the worker
+        self.games.put(None)
+        self.worker.join()
+        self.reader.close()
+
+
+class StatsScreen:  # table of the summaries over the board, toggled with s
+    def __init__(self, game, store: StatsStore):
+        self.game = game
+        self.store = store
+        self.visible = False
+        self.rect = pygame.Rect(0, 0, 0, 0)  # area of the panel on screen, repainted by the mine table
+        self.text_height = 18
+        self.max_rows = 12
+        self.rows: list[list[str]] = []
+        self.seen = -1  # store.written when the rows were built
+
+    def toggle(self) -> None:
+        self.visible = not self.visible
+        if not self.visible:  # let the mine table repaint where the panel was
+            self.game.redraw_requested = True
+
+    def erase(self) -> None:  # call before the mine table updates, so that it repaints last frame's panel
+        if self.visible and self.rect:
+            self.game.mine_table.overlay_rects.append(self.rect)
+
+    def build(self) -> list[list[str]]:  # rows of cells, the first one being the header
+        rows = [['board', 'mines', 'played', 'won', 'best', 'mean', 'streak', 'best streak']]
+        for size, mines, played, won, best, mean, streak, best_streak in self.store.summary()[:self.max_rows]:
+            rows.append([size, str(mines), str(played), f'{won / played:.0%}',
+                         '-' if best is None else f'{best / 1000:.2f}s', f'{mean / 1000:.2f}s' if won else '-',
+                         str(streak), str(best_streak)])
+        board = self.game.mine_table.board
+        if board.mine_total is not None and board.grid_size is not None:
+            times = ', '.join(f'{ms / 1000:.2f}s' for ms in self.store.best_times(board.grid_size, board.mine_total))
+            rows.append([f'best here: {times or "-"}'])
+        return rows
+
+    def draw(self, screen: pygame.Surface) -> pygame.Rect | None:  # the panel, returns its area when shown
+        if not self.visible:
+            return None
+        if self.seen != self.store.written:  # only query again after new games were written
+            self.seen = self.store.written
+            self.rows = self.build()
+        glyphs = self.game.glyphs
+        height = self.text_height
+        gap = height
+        table = self.rows[:-1] if len(self.rows[-1]) == 1 else self.rows
+        widths = [max(glyphs.width([*row[i]], 'white', height) for row in table) for i in range(len(table[0]))]
+        width = max([sum(widths) + gap * (len(widths) - 1),
+                     *(glyphs.width([*row[0]], 'white', height) for row in self.rows if len(row) == 1)])
+        self.rect = pygame.Rect(0, 0, width + 16, height * len(self.rows) + 16)
+        self.rect.center = self.game.mine_table.table_area.center
+        screen.fill((0, 0, 0), self.rect)
+        for i, row in enumerate(self.rows):
+            x = self.rect.x + 8
+            for text, column_width in zip(row, widths):
+                glyphs.draw(screen, (x, self.rect.y + 8 + i * height), [*text], 'white', height)
+                x += column_width + gap
+        return self.rect
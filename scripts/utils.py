@@ -1,5 +1,7 @@
+import importlib.util
 import json
 import os
+import sys
 from pathlib import Path
 
 import pygame
@@ -9,28 +11,45 @@ class ConfigManager:
     def __init__(self, path: Path | str):
         self.path = path if isinstance(path, Path) else Path(path)
         self.data: dict = json.loads(self.path.read_text('utf-8'))
+        self.dirty = False  # changed since the last write
 
     def __getitem__(self, item):
         return self.data[item]
 
+    def get(self, item, default=None):
+        return self.data.get(item, default)
+
     def __setitem__(self, key, value):
         self.data[key] = value
+        self.dirty = True
 
     def write(self):
-        self.path.write_text(json.dumps(self.data), 'utf-8')
-
-
-def load_images(name: str, scale: tuple[int, int] | float = 1.0) -> list[pygame.Surface]:
-    path = Path('./data/images') / name
-    file_list = os.listdir(path)
-    result_list = []
-    for i in range(len(file_list)):
-        result_list.append(pygame.image.load(path / f'{name}_{i}.png').convert_alpha())
-        if isinstance(scale, tuple):
-            result_list[-1] = pygame.transform.scale(result_list[-1], scale)
-        elif (isinstance(scale, float) or isinstance(scale, int)) and scale != 1:
-            result_list[-1] = pygame.transform.scale_by(result_list[-1], scale)
-    return result_list
+        atomic_write(self.path, self.encode())
+
+    def encode(self) -> bytes:
+        self.dirty = False
+        return json.dumps(self.data).encode('utf-8')
+
+
+def atomic_write(path: Path, data: bytes) -> None:  # readers see the old file or the new one, never half of one
+    temp = path.with_name(path.name + '.tmp')
+    with open(temp, 'wb') as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp, path)
+
+
+def lazy_import(name: str):  # a module that is only executed when one of its attributes is first used
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
 
 
 def load_sounds(name: str, volume: float = 1.0) -> list[pygame.mixer.Sound]:
@@ -0,0 +1,124 @@
+import argparse
+import json
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+from scripts.board import Board, TileState
+from scripts.solver import Solver
+
+BOTS = ('random', 'logic', 'solver')
+
+
+class Bot:  # picks the tiles to clear on a headless board
+    def __init__(self, board: Board, policy: str):
+        self.board = board
+        self.policy = policy
+        # logic clears the tiles proven safe and guesses at random, solver guesses the least risky tile instead
+        self.solver = None if policy == 'random' else Solver(board, background=False,
+                                                            probabilities=policy == 'solver')
+        self.rng = np.random.default_rng()
+
+    def play(self, seed: np.random.SeedSequence) -> tuple[bool, int, int]:  # returns (won, tiles cleared, clicks)
+        board = self.board
+        board.restart()
+        board.reseed(int.from_bytes(seed.generate_state(2, np.uint64).tobytes(), 'little'))
+        self.rng = np.random.default_rng(seed.spawn(1)[0])
+        clicks = 1
+        board.clear(tuple(n // 2 for n in board.grid_size))  # open in the middle, like most players
+        while not board.over:
+            for index in self.choose():
+                clicks += 1
+                board.clear(board.position(index))
+                if board.over:
+                    break
+        return board.won, board.tile_cleared, clicks
+
+    def choose(self) -> list[int]:  # tiles to clear next, all of them safe unless a single guess is returned
+        covered = np.flatnonzero(self.board.states == TileState.none)
+        if self.solver is not None:
+            self.solver.update()
+            safe = [v for v in self.solver.safe if self.board.states[v] == TileState.none]
+            if safe:
+                return sorted(safe)
+            if self.policy == 'solver':
+                return [self.solver.hint()]
+            covered = np.setdiff1d(covered, list(self.solver.mines))
+        return [int(self.rng.choice(covered))]
+
+
+def play_games(grid_size: tuple[int, ...], mine_total: int, policy: str, seed: int,
+               first: int, count: int) -> list[tuple[bool, int, int]]:  # games first .. first + count - 1
+    bot = Bot(Board(grid_size, mine_total), policy)
+    # every game has its own seed, so the results do not depend on how the games are split over the workers
+    return [bot.play(np.random.SeedSequence(seed, spawn_key=(i,))) for i in range(first, first + count)]
+
+
+def report(results: list[tuple[bool, int, int]], safe_total: int, seconds: float) -> dict:
+    won = np.array([r[0] for r in results])
+    cleared = np.array([r[1] for r in results])
+    clicks = np.array([r[2] for r in results])
+    percentiles = (0, 10, 25, 50, 75, 90, 100)
+    histogram, _ = np.histogram(cleared / safe_total, 10, (0, 1))
+    return {
+        'games': len(results),
+        'wins': int(won.sum()),
+        'win_rate': float(won.mean()),
+        'seconds': seconds,
+        'games_per_second': len(results) / seconds,
+        'cleared_percentiles': {p: float(v) for p, v in zip(percentiles, np.percentile(cleared, percentiles))},
+        'cleared_histogram': histogram.tolist(),  # share of the safe tiles cleared, in tenths
+        'mean_clicks': float(clicks.mean()),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Play minesweeper games headlessly and report statistics.')
+    parser.add_argument('--size', type=int, nargs='+', default=[16, 16], help='board size, one value per axis')
+    parser.add_argument('--mines', type=int, default=40)
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=None, help='random if omitted; printed for reruns')
+    parser.add_argument('--bot', choices=BOTS, default='logic')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--batch', type=int, default=0, help='games per job, chosen from the game count if 0')
+    parser.add_argument('--json', action='store_true', help='print the report as json')
+    args = parser.parse_args()
+
+    grid_size = tuple(args.size)
+    try:
+        Board(grid_size, args.mines)  # fail early on an invalid configuration
+    except ValueError as error:
+        parser.error(str(error))
+    seed = int(np.random.SeedSequence().entropy) if args.seed is None else args.seed
+    batch = args.batch or max(1, min(1000, args.games // (args.workers * 8)))
+    jobs = [(grid_size, args.mines, args.bot, seed, first, min(batch, args.games - first))
+            for first in range(0, args.games, batch)]
+
+    start = time.perf_counter()
+    if args.workers > 1:
+        with multiprocessing.Pool(args.workers) as pool:
+            results = [game for chunk in pool.starmap(play_games, jobs) for game in chunk]
+    else:
+        results = [game for job in jobs for game in play_games(*job)]
+    stats = report(results, int(np.prod(grid_size)) - args.mines, time.perf_counter() - start)
+    stats.update(size=list(grid_size), mines=args.mines, bot=args.bot, seed=seed)
+
+    if args.json:
+        print(json.dumps(stats))
+        return
+    print(f'{stats["games"]} games on {"x".join(map(str, grid_size))} with {args.mines} mines, '
+          f'bot {args.bot}, seed {seed}')
+    print(f'win rate: {stats["win_rate"]:.2%} ({stats["wins"]} wins)')
+    print(f'speed: {stats["games_per_second"]:.1f} games/s over {stats["seconds"]:.2f}s, '
+          f'{stats["mean_clicks"]:.1f} clicks per game')
+    print('tiles cleared: ' + ', '.join(f'p{p} {v:g}' for p, v in stats['cleared_percentiles'].items()))
+    print('share of safe tiles cleared:')
+    width = max(stats['cleared_histogram'])
+    for i, count in enumerate(stats['cleared_histogram']):
+        print(f'  {i * 10:3d}-{i * 10 + 10:3d}% {"#" * round(40 * count / width) if width else "":40} {count}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# the tests import the game's modules the way main.py does, from the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,73 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from scripts.race import (LEFT, LOST, PACKED, PROGRESS, RESULT, START, VARINT, RaceClient, RaceServer, decode_diff,
+                          encode_diff)
+from scripts.replay import Action
+
+
+@pytest.mark.parametrize('indices', [
+    [],
+    [0],
+    [3, 4, 5, 200, 455],  # gaps below 256 are packed as byte pairs
+    [0, 1000, 1001, 70000],  # a larger gap needs varints
+])
+def test_diff_round_trip(indices):
+    indices = np.array(indices, np.int64)
+    codes = (np.arange(len(indices)) % 13).astype(np.uint8)
+    out = bytearray(b'xy')
+    encode_diff(out, indices, codes)
+    out += b'tail'
+    assert out[3] == (PACKED if not len(indices) or np.diff(indices, prepend=0).max() < 256 else VARINT)
+    decoded, decoded_codes, pos = decode_diff(bytes(out), 2)
+    assert decoded.tolist() == indices.tolist()
+    assert decoded_codes.tolist() == codes.tolist()
+    assert out[pos:] == b'tail'
+
+
+def test_random_diffs_round_trip():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        indices = np.sort(rng.choice(100_000, int(rng.integers(0, 50)), replace=False))
+        codes = rng.integers(0, 13, len(indices)).astype(np.uint8)
+        out = bytearray()
+        encode_diff(out, indices, codes)
+        decoded, decoded_codes, pos = decode_diff(bytes(out), 0)
+        assert np.array_equal(decoded, indices) and np.array_equal(decoded_codes, codes) and pos == len(out)
+
+
+def lose(server: RaceServer, client: RaceClient, race_id: int, number: int) -> None:
+    board = server.races[race_id].players[number].board
+    client.click(Action.clear, int(np.flatnonzero(board.cells == -1)[0]))
+
+
+async def new_game_during_a_race() -> None:
+    server = RaceServer()
+    listener = await server.serve('127.0.0.1', 0)
+    port = listener.sockets[0].getsockname()[1]
+    a, b = [await RaceClient.connect('127.0.0.1', port) for _ in range(2)]
+    a.join((16, 16), 40, 2)
+    b.join((16, 16), 40, 2)
+    _, race_id, number_a, *_ = await a.expect(START)
+    _, _, number_b, *_ = await b.expect(START)
+
+    lose(server, b, race_id, number_b)
+    progress = await a.expect(PROGRESS)
+    assert progress[1:3] == (number_b, LOST)
+    a.join((16, 16), 40, 2)  # a new game while still racing ends the race for the other player only
+    result = await b.expect(RESULT)
+    assert {n: status for n, status, *_ in result[1]} == {number_a: LEFT, number_b: LOST}
+    assert server.races == {}
+    with pytest.raises(asyncio.TimeoutError):  # a gets no result of the race it left
+        await asyncio.wait_for(a.expect(RESULT), 0.2)
+    assert server.waiting() == 1
+    for client in (a, b):
+        await client.close()
+    listener.close()
+
+
+def test_new_game_during_a_race():
+    asyncio.run(new_game_during_a_race())
+
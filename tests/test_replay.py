@@ -0,0 +1,82 @@
+import io
+
+import numpy as np
+import pytest
+
+from scripts.board import Board, TileState
+from scripts.replay import Action, ReplayPlayer, ReplayRecorder, read_replays
+
+
+def play(board: Board, recorder: ReplayRecorder, seed: int) -> list[np.ndarray]:
+    # random but legal actions, recorded when they change something; returns the states after each event
+    rng = np.random.default_rng(seed)
+    history = [board.states.copy()]
+    ms = 0
+    while not board.over and len(history) < 200:
+        covered = np.flatnonzero(board.states == TileState.none)
+        cleared = np.flatnonzero(board.states == TileState.cleared)
+        roll = rng.random()
+        if roll < 0.2 and board.generated:
+            action, index = Action.flag, int(rng.choice(np.concatenate([covered, cleared])))
+        elif roll < 0.3 and len(cleared):
+            action, index = Action.chord, int(rng.choice(cleared))
+        else:
+            safe = covered[board.cells[covered] != -1] if board.generated else covered
+            action, index = Action.clear, int(rng.choice(safe if len(safe) and rng.random() < 0.97 else covered))
+        version = board.version
+        pos = board.position(index)
+        {Action.clear: board.clear, Action.flag: board.toggle_flag, Action.chord: board.chord}[action](pos)
+        ms += int(rng.integers(0, 3000))
+        if board.version != version:
+            recorder.record(ms, action, pos)
+            history.append(board.states.copy())
+    return history
+
+
+def decode(recorder: ReplayRecorder):
+    replays = list(read_replays(io.BytesIO(recorder.encode())))
+    assert len(replays) == 1
+    return replays[0]
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('seeded', [True, False])
+def test_seek_matches_the_game(seed, seeded):
+    board = Board((16, 16), 40, seed=seed)
+    if not seeded:  # mines in place before the game starts are stored as a bitmap
+        board.generate((8, 8))
+    recorder = ReplayRecorder(board, snapshot_every=4)
+    recorder.start()
+    history = play(board, recorder, seed)
+
+    replay = decode(recorder)
+    assert len(replay) == len(history) - 1
+    assert (replay.seed is not None) == seeded
+    assert replay.times[-1] == recorder.events[-1][0]
+    player = ReplayPlayer(replay)
+    assert np.array_equal(player.board.cells, board.cells)
+    order = list(range(len(history))) + list(range(len(history) - 1, -1, -3)) + [len(history) // 2, 0]
+    for position in order:
+        player.seek(position)
+        assert np.array_equal(player.board.states, history[position]), position
+
+
+def test_seek_time():
+    board = Board((9, 9), 10, seed=2)
+    recorder = ReplayRecorder(board, snapshot_every=2)
+    recorder.start()
+    history = play(board, recorder, 2)
+    player = ReplayPlayer(decode(recorder))
+    for i, (ms, _, _) in enumerate(recorder.events):
+        player.seek_time(ms)
+        # every event up to that time is applied, events at the same millisecond included
+        last = max(j for j, event in enumerate(recorder.events) if event[0] <= ms)
+        assert np.array_equal(player.board.states, history[last + 1]), i
+
+
+def test_flag_on_a_cleared_tile_is_no_change():
+    board = Board((9, 9), 10, seed=4)
+    board.clear((4, 4))
+    version = board.version
+    board.toggle_flag((4, 4))
+    assert board.version == version
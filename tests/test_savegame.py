@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from scripts.board import Board, TileState
+from scripts.savegame import decode_game, encode_game
+
+
+@pytest.mark.parametrize('grid_size, mine_total', [((9, 9), 10), ((30, 16), 99), ((5, 4, 3), 6)])
+def test_round_trip(grid_size, mine_total):
+    board = Board(grid_size, mine_total, seed=3)
+    board.clear(tuple(n // 2 for n in grid_size))
+    covered = np.flatnonzero(board.states == TileState.none)
+    for index in covered[:3].tolist():
+        board.toggle_flag(board.position(index))
+
+    loaded, elapsed_ms = decode_game(encode_game(board.grid_size, board.mine_total, board.cells, board.states, 12345))
+    assert elapsed_ms == 12345
+    assert loaded.grid_size == board.grid_size and loaded.mine_total == board.mine_total
+    assert np.array_equal(loaded.cells, board.cells)
+    assert np.array_equal(loaded.states, board.states)
+    assert (loaded.tile_cleared, loaded.tile_flagged, loaded.over) == (board.tile_cleared, board.tile_flagged, False)
+
+
+def test_lost_game_round_trip():
+    board = Board((9, 9), 10, seed=1)
+    board.clear((4, 4))
+    board.clear(board.position(int(np.flatnonzero(board.cells == -1)[0])))
+    loaded, _ = decode_game(encode_game(board.grid_size, board.mine_total, board.cells, board.states, 0))
+    assert loaded.over and not loaded.won
+    assert np.array_equal(loaded.states, board.states)
+
+
+def test_rejects_other_data():
+    with pytest.raises(ValueError):
+        decode_game(b'not a save at all')
@@ -0,0 +1,84 @@
+import time
+
+import numpy as np
+import pytest
+
+from scripts.board import Board, TileState
+from scripts.solver import Solver, solve_component
+
+
+def long_frontier(rows: int = 3000) -> Board:
+    # the first two columns cleared and every number of the second positive, so that the covered third column is
+    # one frontier component with a group of variables per tile
+    rng = np.random.default_rng(0)
+    mines = np.zeros((rows, 3), bool)
+    mines[::3, 2] = True
+    mines[rng.choice(rows, rows // 10, replace=False), 2] = True
+    board = Board((rows, 3), int(mines.sum()))
+    board.set_mines(mines)
+    board.load_states(np.where(np.arange(rows * 3) % 3 < 2, TileState.cleared, TileState.none).astype(np.uint8))
+    return board
+
+
+def settle(solver: Solver, seconds: float = 60) -> None:
+    deadline = time.monotonic() + seconds
+    solver.update()
+    while solver.busy and time.monotonic() < deadline:
+        time.sleep(0.01)
+        solver.update()
+    assert not solver.busy
+
+
+@pytest.mark.parametrize('background', [False, True])
+def test_long_single_component_frontier(background):
+    board = long_frontier()
+    solver = Solver(board, background=background)
+    settle(solver)
+    assert len(solver.components) == 1
+    assert solver.safe and solver.mines
+    assert all(board.cells[v] != -1 for v in solver.safe)
+    assert all(board.cells[v] == -1 for v in solver.mines)
+    assert solver.hint() in solver.safe
+
+
+def test_enumeration_of_long_chains():
+    # a chain of constraints over pairs, longer than python allows frames, has exactly two layouts
+    n = 5000
+    layouts, tallies = solve_component(tuple(range(n)), [((i, i + 1), 1) for i in range(n - 1)], budget=10 ** 6)
+    assert layouts == {n // 2: 2}
+    assert np.allclose(tallies[n // 2], 1)
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_safe_and_mines_are_right(seed):
+    board = Board((16, 16), 40, seed=seed)
+    solver = Solver(board, background=False)
+    board.clear((8, 8))
+    while not board.over:
+        solver.update()
+        assert all(board.cells[v] != -1 for v in solver.safe)
+        assert all(board.cells[v] == -1 for v in solver.mines)
+        covered = solver.probability[board.states == TileState.none]
+        assert np.all((covered >= 0) & (covered <= 1))
+        board.clear(board.position(solver.hint()))
+
+
+def test_worker_survives_a_failing_component(monkeypatch):
+    import scripts.solver
+    analyse = scripts.solver.analyse_component
+    calls = []
+
+    def failing_once(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError('failing component')
+        return analyse(*args, **kwargs)
+
+    monkeypatch.setattr(scripts.solver, 'analyse_component', failing_once)
+    board = Board((30, 16), 99, seed=5)
+    solver = Solver(board)
+    board.clear((15, 8))
+    settle(solver, 10)
+    board.clear(board.position(solver.hint()))
+    settle(solver, 10)
+    assert len(calls) > 1